@@ -0,0 +1,290 @@
+import heapq
+
+from skip_list import SkipList
+
+# Every allocator hands out blocks of one region of memory and has the same interface:
+#   allocate(size) returns the start address of a new block, or None if the request can't be placed,
+#   free(start, size) gives back a block returned by allocate,
+#   holes() lists the free blocks as (start, size) pairs in address order,
+#   hole_count(), largest_hole() and the free_bytes field describe the free memory without building that list.
+
+# This class keeps track of the free memory (holes) for the placement policies that carve blocks out of variable sized holes.
+# Holes are indexed by start and end address in dicts, which find the neighbours of a freed block in O(1) for coalescing,
+# and in two skip lists: by start address for the policies that scan memory in order,
+# and by (size, start), which turns searches by size into O(log n) lookups. Adding or removing a hole takes O(log n).
+# Subclasses only decide which hole a request is placed in.
+#
+# Freeing the block of a process that asked for no memory can leave an empty hole: a point with no neighbouring hole.
+# The next request for no memory is placed in the lowest one. They are kept apart from the real holes and follow
+# the rules of the original free list, so placement stays exactly the same:
+#   - freeing a block absorbs an empty hole where the block ends, and one where it starts unless a hole ends there too,
+#     in which case the empty hole ends up inside the merged hole and stays,
+#   - an empty hole that a split moved the start of a hole onto (see touching_empty_holes) is absorbed by the next free,
+#     wherever that is, unless the hole is allocated first, and then it stays inside the allocated block,
+#   - they don't count as holes in holes(), hole_count() or largest_hole().
+class HoleAllocator:
+    hole_sizes: dict[int, int]
+    hole_ends: dict[int, int]
+    hole_starts: SkipList
+    holes_by_size: SkipList
+    empty_holes: SkipList
+    # Empty holes at the start of a real hole.
+    touching_empty_holes: set[int]
+    free_bytes: int
+
+    def __init__(self, start: int, size: int):
+        self.hole_sizes = {}
+        self.hole_ends = {}
+        self.hole_starts = SkipList()
+        self.holes_by_size = SkipList()
+        self.empty_holes = SkipList()
+        self.touching_empty_holes = set()
+        self.free_bytes = 0
+        if size > 0:
+            self._add_hole(start, size)
+        elif size == 0:
+            self.empty_holes.add(start)
+
+    # Returns the start of the hole the request should go in, or None if no hole is large enough.
+    def find_hole(self, size: int) -> int | None:
+        raise NotImplementedError
+
+    # Returns the start address of the allocated block, or None if no hole is large enough.
+    def allocate(self, size: int) -> int | None:
+        if size == 0 and len(self.empty_holes) > 0:
+            start = next(iter(self.empty_holes))
+            self.empty_holes.remove(start)
+            self.touching_empty_holes.discard(start)
+            return start
+
+        start = self.find_hole(size)
+        if start is None:
+            return None
+
+        hole_size = self.hole_sizes[start]
+        self._remove_hole(start)
+        # An empty hole at the start is inside the block now.
+        self.touching_empty_holes.discard(start)
+        if hole_size > size:
+            self._add_hole(start + size, hole_size - size)
+            if size > 0 and start + size in self.empty_holes:
+                self.touching_empty_holes.add(start + size)
+        return start
+
+    def free(self, freed_start: int, freed_size: int):
+        freed_end = freed_start + freed_size
+        # Real holes never touch each other, so at most one hole ends where the block starts
+        # and at most one starts where it ends.
+        left_start = self.hole_ends.get(freed_start)
+        if freed_end in self.empty_holes:
+            self.empty_holes.remove(freed_end)
+        if left_start is None and freed_start in self.empty_holes:
+            self.empty_holes.remove(freed_start)
+
+        if left_start is not None:
+            freed_size += self.hole_sizes[left_start]
+            freed_start = left_start
+            self._remove_hole(left_start)
+
+        right_start = freed_start + freed_size
+        if right_start in self.hole_sizes:
+            freed_size += self.hole_sizes[right_start]
+            self._remove_hole(right_start)
+
+        if freed_size > 0:
+            self._add_hole(freed_start, freed_size)
+        else:
+            self.empty_holes.add(freed_start)
+
+        for start in self.touching_empty_holes:
+            if start in self.empty_holes:
+                self.empty_holes.remove(start)
+        self.touching_empty_holes.clear()
+
+    # Returns the holes as (start, size) pairs in address order.
+    def holes(self) -> list[tuple[int, int]]:
+        return [(start, self.hole_sizes[start]) for start in self.hole_starts]
+
+    def hole_count(self) -> int:
+        return len(self.hole_sizes)
+
+    def largest_hole(self) -> int:
+        largest = self.holes_by_size.last()
+        return largest[0] if largest is not None else 0
+
+    def _add_hole(self, start: int, size: int):
+        self.hole_sizes[start] = size
+        self.hole_ends[start + size] = start
+        self.hole_starts.add(start)
+        self.holes_by_size.add((size, start))
+        self.free_bytes += size
+
+    def _remove_hole(self, start: int):
+        size = self.hole_sizes.pop(start)
+        del self.hole_ends[start + size]
+        self.hole_starts.remove(start)
+        self.holes_by_size.remove((size, start))
+        self.free_bytes -= size
+
+# Places new processes using best-fit: the smallest hole that is large enough.
+# Ties between equally sized holes go to the lowest address, same as a scan of the address-ordered list.
+class BestFitAllocator(HoleAllocator):
+    def find_hole(self, size: int) -> int | None:
+        hole = self.holes_by_size.ceiling((size,))
+        return hole[1] if hole is not None else None
+
+# Places new processes in the largest hole, the lowest one if several are equally large.
+class WorstFitAllocator(HoleAllocator):
+    def find_hole(self, size: int) -> int | None:
+        largest = self.holes_by_size.last()
+        if largest is None or largest[0] < size:
+            return None
+        return self.holes_by_size.ceiling((largest[0],))[1]
+
+# Places new processes in the lowest hole that is large enough.
+# This is a scan of the holes in address order, which stops as soon as a hole fits.
+class FirstFitAllocator(HoleAllocator):
+    def find_hole(self, size: int) -> int | None:
+        return self._scan(self.hole_starts, size)
+
+    # Returns the first of the given hole starts whose hole is large enough, stopping before the hole at end if there is one.
+    def _scan(self, starts, size: int, end: int | None = None) -> int | None:
+        hole_sizes = self.hole_sizes
+        for start in starts:
+            if start == end:
+                break
+            if hole_sizes[start] >= size:
+                return start
+        return None
+
+# Like first-fit, but the search starts where the previous allocation ended (the rover) and wraps around,
+# which spreads processes over memory instead of piling them up at the low addresses.
+class NextFitAllocator(FirstFitAllocator):
+    rover: int
+
+    def __init__(self, start: int, size: int):
+        super().__init__(start, size)
+        self.rover = start
+
+    def find_hole(self, size: int) -> int | None:
+        # Start at the hole holding the rover if there is one, otherwise at the first hole after it.
+        first = self.hole_starts.floor(self.rover)
+        if first is None or first + self.hole_sizes[first] <= self.rover:
+            first = self.hole_starts.ceiling(self.rover)
+
+        start = self._scan(self.hole_starts.iter_from(first), size) if first is not None else None
+        if start is None:
+            start = self._scan(self.hole_starts, size, first)
+        if start is not None:
+            self.rover = start + size
+        return start
+
+# Binary buddy allocator.
+# Requests are rounded up to a power of two and served from blocks aligned to their size (relative to the start of the region),
+# so the buddy of a block is found by flipping one bit of its offset, and split and merge take O(log n).
+# The region doesn't have to be a power of two: it starts out cut into the largest aligned blocks that fit,
+# and two buddies are only merged if the merged block lies inside the region.
+# Every order keeps a set of its free offsets and a heap of them, so the lowest free block of an order is used first.
+# Heap entries of blocks that were taken or merged are dropped lazily.
+class BuddyAllocator:
+    start: int
+    size: int
+    free_blocks: list[set[int]]
+    free_heaps: list[list[int]]
+    free_bytes: int
+
+    def __init__(self, start: int, size: int):
+        self.start = start
+        self.size = max(size, 0)
+        self.free_blocks = [set() for _ in range(max(self.size.bit_length(), 1))]
+        self.free_heaps = [[] for _ in self.free_blocks]
+        self.free_bytes = 0
+
+        offset = 0
+        while offset < self.size:
+            order = (self.size - offset).bit_length() - 1
+            self._add_block(offset, order)
+            offset += 1 << order
+
+    # Order of the smallest block that can hold size bytes.
+    @staticmethod
+    def order_of(size: int) -> int:
+        return max(size - 1, 0).bit_length()
+
+    def allocate(self, size: int) -> int | None:
+        order = self.order_of(size)
+        available = order
+        while available < len(self.free_blocks) and not self.free_blocks[available]:
+            available += 1
+        if available >= len(self.free_blocks):
+            return None
+
+        offset = self._lowest_block(available)
+        # An empty request takes nothing, it only gets an address.
+        if size <= 0:
+            return self.start + offset
+
+        self._remove_block(offset, available)
+        # Split until the block has the requested order, giving back the upper halves.
+        while available > order:
+            available -= 1
+            self._add_block(offset + (1 << available), available)
+        return self.start + offset
+
+    def free(self, freed_start: int, freed_size: int):
+        if freed_size <= 0:
+            return
+
+        offset = freed_start - self.start
+        order = self.order_of(freed_size)
+        while order + 1 < len(self.free_blocks):
+            buddy = offset ^ (1 << order)
+            merged = offset & ~(1 << order)
+            if buddy not in self.free_blocks[order] or merged + (2 << order) > self.size:
+                break
+            self._remove_block(buddy, order)
+            offset = merged
+            order += 1
+        self._add_block(offset, order)
+
+    def holes(self) -> list[tuple[int, int]]:
+        return sorted((self.start + offset, 1 << order) for order, blocks in enumerate(self.free_blocks) for offset in blocks)
+
+    def hole_count(self) -> int:
+        return sum(len(blocks) for blocks in self.free_blocks)
+
+    def largest_hole(self) -> int:
+        for order in range(len(self.free_blocks) - 1, -1, -1):
+            if self.free_blocks[order]:
+                return 1 << order
+        return 0
+
+    def _lowest_block(self, order: int) -> int:
+        heap = self.free_heaps[order]
+        while heap[0] not in self.free_blocks[order]:
+            heapq.heappop(heap)
+        return heap[0]
+
+    def _add_block(self, offset: int, order: int):
+        blocks = self.free_blocks[order]
+        blocks.add(offset)
+        heap = self.free_heaps[order]
+        # Rebuild the heap once stale entries make up most of it, so churn can't grow it without bound.
+        if len(heap) > 2 * len(blocks) + 16:
+            heap[:] = sorted(blocks)
+        else:
+            heapq.heappush(heap, offset)
+        self.free_bytes += 1 << order
+
+    def _remove_block(self, offset: int, order: int):
+        self.free_blocks[order].remove(offset)
+        self.free_bytes -= 1 << order
+
+ALLOCATORS: dict[str, type] = {
+    "best_fit": BestFitAllocator,
+    "first_fit": FirstFitAllocator,
+    "next_fit": NextFitAllocator,
+    "worst_fit": WorstFitAllocator,
+    "buddy": BuddyAllocator,
+}
+DEFAULT_ALLOCATOR = "best_fit"
@@ -0,0 +1,153 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+import glob
+import os
+from pathlib import Path
+import sys
+import tempfile
+import time
+
+from simulator import Simulator, JSON_LINES_SUFFIX, MB_TO_BYTES
+
+# Expected logs are looked up as <expected_dir>/<description stem><EXPECTED_LOG_SUFFIX>.
+EXPECTED_LOG_SUFFIX = ".txt"
+DEFAULT_EXPECTED_DIR = "correct_output"
+
+PASSED = "passed"
+FAILED = "failed"
+UNCHECKED = "unchecked"
+ERROR = "error"
+
+@dataclass(slots=True)
+class BatchResult:
+    description_path: Path
+    status: str
+    seconds: float
+    simulated_time: int
+    message: str
+
+# Expands directories (every .json and .jsonl file in them) and glob patterns into a sorted list of descriptions.
+def find_descriptions(patterns: list[str]) -> list[Path]:
+    descriptions = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = [path for path in glob.glob(os.path.join(pattern, "*")) if Path(path).suffix in (".json", JSON_LINES_SUFFIX)]
+        else:
+            matches = glob.glob(pattern)
+        descriptions.extend(sorted(Path(path) for path in matches))
+    return descriptions
+
+# Caps the address space of a worker, so a runaway simulation fails with a MemoryError instead of taking the machine down.
+def limit_worker_memory(memory_limit: int | None):
+    if memory_limit is not None:
+        import resource
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+# Returns a description of the first difference between the two logs, or None if they are identical.
+def compare_logs(log_path: Path, expected_path: Path) -> str | None:
+    with open(log_path, 'r') as log, open(expected_path, 'r') as expected:
+        line_number = 1
+        for line, expected_line in zip(log, expected):
+            if line != expected_line:
+                return f"line {line_number}: expected {expected_line.rstrip()!r}, got {line.rstrip()!r}"
+            line_number += 1
+        # One of the logs ended early
+        remaining_line = log.readline()
+        remaining_expected = expected.readline()
+        if remaining_line != remaining_expected:
+            return f"line {line_number}: expected {remaining_expected.rstrip()!r}, got {remaining_line.rstrip()!r}"
+    return None
+
+# Runs in a worker process. Every failure is turned into a result, so one bad description can't stop the batch.
+def run_one(description_path: Path, log_path: Path, expected_path: Path, student_logs: bool) -> BatchResult:
+    start = time.perf_counter()
+    simulated_time = 0
+    try:
+        simulator = Simulator(description_path, log_path, student_logs)
+        simulator.run_simulator()
+        simulated_time = simulator.elapsed_time
+    except AssertionError:
+        return BatchResult(description_path, ERROR, time.perf_counter() - start, simulated_time, "invalid simulation description")
+    except Exception as error:
+        # Keep the message on one line
+        message = " ".join(str(error).split())
+        return BatchResult(description_path, ERROR, time.perf_counter() - start, simulated_time, f"{type(error).__name__}: {message}")
+    seconds = time.perf_counter() - start
+
+    if not expected_path.exists():
+        return BatchResult(description_path, UNCHECKED, seconds, simulated_time, f"no {expected_path}")
+    difference = compare_logs(log_path, expected_path)
+    if difference is not None:
+        return BatchResult(description_path, FAILED, seconds, simulated_time, difference)
+    return BatchResult(description_path, PASSED, seconds, simulated_time, "")
+
+def print_result(result: BatchResult):
+    line = f"{result.status:<9} {result.seconds:8.3f}s  {result.description_path}"
+    if result.message:
+        line += f"  ({result.message})"
+    print(line, flush=True)
+
+def print_summary(results: list[BatchResult], wall_seconds: float):
+    counts = {status: 0 for status in (PASSED, FAILED, UNCHECKED, ERROR)}
+    for result in results:
+        counts[result.status] += 1
+    simulated_ms = sum(result.simulated_time for result in results) / 1000
+
+    print()
+    print(f"{len(results)} simulations in {wall_seconds:.2f}s: " + ", ".join(f"{count} {status}" for status, count in counts.items()))
+    if wall_seconds > 0:
+        print(f"Throughput: {len(results) / wall_seconds:.2f} simulations/s, {simulated_ms / wall_seconds:.1f} simulated ms/s")
+    for result in results:
+        if result.status in (FAILED, ERROR):
+            print(f"  {result.status}: {result.description_path}  ({result.message})")
+
+# Runs every description in its own worker and prints each result as soon as it finishes.
+# Returns the results in the order they finished.
+def run_batch(descriptions: list[Path], log_dir: Path, expected_dir: Path, student_logs: bool,
+              workers: int | None, memory_limit: int | None) -> list[BatchResult]:
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=limit_worker_memory, initargs=(memory_limit,)) as executor:
+        futures = {}
+        for index, description_path in enumerate(descriptions):
+            # The index keeps logs of descriptions with the same name in different directories apart.
+            log_path = log_dir / f"{index:05}_{description_path.stem}.log"
+            expected_path = expected_dir / (description_path.stem + EXPECTED_LOG_SUFFIX)
+            futures[executor.submit(run_one, description_path, log_path, expected_path, student_logs)] = description_path
+
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as error:
+                # The worker itself died (e.g. it was killed for using too much memory).
+                result = BatchResult(futures[future], ERROR, 0.0, 0, f"worker failed: {type(error).__name__}: {error}")
+            print_result(result)
+            results.append(result)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runs many simulations in parallel and checks their logs against the expected output.")
+    parser.add_argument("descriptions", nargs="+", help="simulation descriptions, directories of them or glob patterns")
+    parser.add_argument("--expected-dir", type=Path, default=Path(DEFAULT_EXPECTED_DIR),
+                        help=f"directory holding the expected log of each description as <name>{EXPECTED_LOG_SUFFIX} (default: {DEFAULT_EXPECTED_DIR})")
+    parser.add_argument("--log-dir", type=Path, help="keep the logs in this directory instead of a temporary one")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes (default: one per core)")
+    parser.add_argument("--memory-limit-mb", type=int, help="address space limit of each worker")
+    parser.add_argument("--no-student-logs", action="store_true", help="leave out the messages logged by the kernel")
+    args = parser.parse_args()
+
+    descriptions = find_descriptions(args.descriptions)
+    if len(descriptions) == 0:
+        print("No simulation descriptions found")
+        sys.exit(1)
+    memory_limit = None if args.memory_limit_mb is None else args.memory_limit_mb * MB_TO_BYTES
+
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as temporary_dir:
+        log_dir = args.log_dir if args.log_dir is not None else Path(temporary_dir)
+        log_dir.mkdir(parents=True, exist_ok=True)
+        results = run_batch(descriptions, log_dir, args.expected_dir, not args.no_student_logs, args.workers, memory_limit)
+    print_summary(results, time.perf_counter() - start)
+
+    if any(result.status in (FAILED, ERROR) for result in results):
+        sys.exit(1)
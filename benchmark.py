@@ -0,0 +1,205 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import json
+import multiprocessing
+import os
+from pathlib import Path
+import random
+import sys
+import tempfile
+import time
+
+import kernel as kernel_module
+from kernel import Kernel, MMU, VIRTUAL_BASE
+from paging import PagingConfig
+from simulator import MB_TO_BYTES, JSON_LINES_SUFFIX, Simulator, StudentLogger, VALID_SCHEDULING_ALGORITHMS
+from workload_generator import WorkloadConfig, write_workload
+
+# Number of processes kept ready while the syscalls are timed, unless a benchmark asks for more.
+DISPATCH_PROCESSES = 4
+DEFAULT_PROCESS_COUNTS = [1000, 10000, 100000]
+TRANSLATE_ADDRESSES = 500000
+TRANSLATE_MEMORY = 10 * MB_TO_BYTES
+
+# Times how long each kernel entry point takes per call for one scheduling algorithm, with the given number of processes.
+# The kernel is kept in a steady state (nothing blocks and nothing is preempted)
+# so the numbers are dominated by how a call gets to the code of the policy and by the size of its queues.
+# Arrivals and exits change the number of processes, so they are timed once each over all of them.
+def bench_dispatch(scheduling_algorithm: str, iterations: int, processes: int = DISPATCH_PROCESSES) -> dict[str, float]:
+    logger = StudentLogger(None)
+    kernel = Kernel(scheduling_algorithm, logger, MMU(logger), max(1000, processes + 10) * MB_TO_BYTES)
+
+    timings = {}
+
+    start = time.perf_counter()
+    for pid in range(1, processes + 1):
+        kernel.new_process_arrived(pid, 32, "Foreground", MB_TO_BYTES)
+    timings["new_process_arrived"] = (time.perf_counter() - start) / processes
+    kernel.syscall_init_semaphore(0, iterations + 1)
+    kernel.syscall_init_mutex(0)
+    priority = kernel.running.priority
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        kernel.timer_interrupt()
+    timings["timer_interrupt"] = (time.perf_counter() - start) / iterations
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        kernel.syscall_set_priority(priority)
+    timings["syscall_set_priority"] = (time.perf_counter() - start) / iterations
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        kernel.syscall_semaphore_p(0)
+        kernel.syscall_semaphore_v(0)
+    timings["syscall_semaphore_p/v"] = (time.perf_counter() - start) / iterations
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        kernel.syscall_mutex_lock(0)
+        kernel.syscall_mutex_unlock(0)
+    timings["syscall_mutex_lock/unlock"] = (time.perf_counter() - start) / iterations
+
+    start = time.perf_counter()
+    for _ in range(processes):
+        kernel.syscall_exit()
+    timings["syscall_exit"] = (time.perf_counter() - start) / processes
+
+    return {name: seconds * 1e9 for name, seconds in timings.items()}
+
+# Times MMU.translate_many per address on the pure Python path and, if NumPy is installed, the vectorised one,
+# over addresses of one process of which about a tenth fault, and checks that both paths give the same results.
+# With paging both go through the TLB, which is emptied before each run so they see the same hits and misses.
+def bench_translate(paging: bool, addresses: int = TRANSLATE_ADDRESSES) -> dict[str, float]:
+    logger = StudentLogger(None)
+    paging_config = PagingConfig() if paging else None
+    kernel = Kernel("RR", logger, MMU(logger), 100 * MB_TO_BYTES, paging=paging_config)
+    pid = 1
+    kernel.new_process_arrived(pid, 32, "Foreground", TRANSLATE_MEMORY)
+    generator = random.Random(0)
+    virtual = [VIRTUAL_BASE + generator.randrange(TRANSLATE_MEMORY * 10 // 9) for _ in range(addresses)]
+
+    timings = {}
+    results = {}
+    for name, use_numpy in (("python_ns", False), ("numpy_ns", True)):
+        if use_numpy and kernel_module.numpy is None:
+            continue
+        if paging:
+            kernel.mmu.enable_paging(paging_config)
+        start = time.perf_counter()
+        physical, faults = kernel.mmu.translate_many(virtual, pid, use_numpy)
+        timings[name] = (time.perf_counter() - start) / addresses * 1e9
+        results[name] = (list(map(int, physical)), list(map(bool, faults)))
+
+    if "numpy_ns" in results:
+        assert(results["numpy_ns"] == results["python_ns"]), "MMU.translate_many gives different results with NumPy"
+    return timings
+
+def print_translate_report(repeat: int) -> list[dict]:
+    if kernel_module.numpy is None:
+        print("NumPy isn't installed, only the pure Python path of MMU.translate_many is timed")
+    results = {("paging" if paging else "contiguous"): best_of(repeat, bench_translate, paging) for paging in (False, True)}
+    checked = "" if kernel_module.numpy is None else ", NumPy results checked against pure Python"
+    print_table(f"MMU.translate_many, ns per address (best of {repeat} x {TRANSLATE_ADDRESSES} addresses{checked})", results, 16, 1, "memory")
+    return [{"memory": memory, **timings} for memory, timings in results.items()]
+
+# Times building the simulator (which parses a JSON description, but only the first line of a JSON Lines one)
+# and running it to the end, with the log thrown away.
+# A tick is one simulated us, so ticks_per_s is simulated time over wall time.
+def bench_simulation(description_path: Path, scheduling_algorithm: str) -> dict[str, float]:
+    start = time.perf_counter()
+    simulator = Simulator(description_path, os.devnull, True, overrides={"scheduling_algorithm": scheduling_algorithm})
+    init_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    simulator.run_simulator()
+    run_seconds = time.perf_counter() - start
+
+    return {
+        "init_s": init_seconds,
+        "run_s": run_seconds,
+        "ticks": simulator.elapsed_time,
+        "ticks_per_s": simulator.elapsed_time / run_seconds if run_seconds > 0 else 0.0,
+    }
+
+# Keeps the fastest of several runs, which filters out most of the noise from the rest of the machine.
+def best_of(repeat: int, bench, *args) -> dict[str, float]:
+    best = bench(*args)
+    for _ in range(repeat - 1):
+        for name, value in bench(*args).items():
+            best[name] = min(best[name], value)
+    return best
+
+# Peak resident set size of this process in bytes. ru_maxrss is in KB on Linux and in bytes on macOS.
+def peak_rss() -> int:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def measure_peak_rss(bench, *args) -> dict[str, float]:
+    results = bench(*args)
+    results["peak_rss_MB"] = peak_rss() / MB_TO_BYTES
+    return results
+
+# Runs bench(*args) in a fresh process and adds the peak RSS of that process to the results,
+# so every measurement starts from a clean heap and the memory of earlier ones doesn't count.
+def run_isolated(bench, *args) -> dict[str, float]:
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(measure_peak_rss, bench, *args).result()
+
+def print_table(title: str, results: dict[str, dict[str, float]], width: int, decimals: int, label: str = "algorithm"):
+    names = list(next(iter(results.values())).keys())
+    print(title)
+    print(f"{label:<12}" + "".join(f"{name:>{width}}" for name in names))
+    for row, timings in results.items():
+        print(f"{row:<12}" + "".join(f"{timings[name]:>{width}.{decimals}f}" for name in names))
+    print()
+
+def print_dispatch_report(algorithms: list[str], process_counts: list[int], iterations: int, repeat: int) -> list[dict]:
+    rows = []
+    for processes in process_counts:
+        results = {algorithm: run_isolated(best_of, repeat, bench_dispatch, algorithm, iterations, processes) for algorithm in algorithms}
+        print_table(f"Kernel dispatch overhead with {processes} processes, ns per call (best of {repeat} x {iterations} iterations)",
+                    results, 28, 1)
+        rows.extend({"processes": processes, "algorithm": algorithm, **timings} for algorithm, timings in results.items())
+    return rows
+
+# Every description is generated once per process count and run with each scheduling algorithm.
+def print_simulation_report(algorithms: list[str], process_counts: list[int], suffix: str, seed: int) -> list[dict]:
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for processes in process_counts:
+            description_path = Path(directory) / f"workload_{processes}{suffix}"
+            write_workload(WorkloadConfig(processes=processes, seed=seed, semaphores=2, mutexes=2), description_path)
+            results = {algorithm: run_isolated(bench_simulation, description_path, algorithm) for algorithm in algorithms}
+            print_table(f"Simulation of {processes} processes ({suffix} description)", results, 16, 3)
+            rows.extend({"processes": processes, "algorithm": algorithm, **timings} for algorithm, timings in results.items())
+            description_path.unlink()
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for the kernel and simulator. Every measurement runs in its own process.")
+    parser.add_argument("--suite", choices=["dispatch", "translate", "simulation", "all"], default="all", help="benchmarks to run (default: all)")
+    parser.add_argument("--processes", type=int, nargs="+", default=DEFAULT_PROCESS_COUNTS,
+                        help=f"process counts to measure at (default: {' '.join(map(str, DEFAULT_PROCESS_COUNTS))})")
+    parser.add_argument("--algorithms", nargs="+", choices=sorted(VALID_SCHEDULING_ALGORITHMS), default=sorted(VALID_SCHEDULING_ALGORITHMS))
+    parser.add_argument("--iterations", type=int, default=200000, help="calls per timed syscall")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per dispatch measurement, the fastest is reported")
+    parser.add_argument("--description-format", choices=["json", "jsonl"], default="jsonl",
+                        help="format of the generated descriptions; JSON is parsed up front by Simulator.__init__ (default: jsonl)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the generated workloads")
+    parser.add_argument("--output", type=Path, help="also write every result to this JSON file")
+    args = parser.parse_args()
+
+    results = {}
+    if args.suite in ("dispatch", "all"):
+        results["dispatch"] = print_dispatch_report(args.algorithms, args.processes, args.iterations, args.repeat)
+    if args.suite in ("translate", "all"):
+        results["translate"] = print_translate_report(args.repeat)
+    if args.suite in ("simulation", "all"):
+        suffix = JSON_LINES_SUFFIX if args.description_format == "jsonl" else ".json"
+        results["simulation"] = print_simulation_report(args.algorithms, args.processes, suffix, args.seed)
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=4)
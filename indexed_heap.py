@@ -0,0 +1,82 @@
+# A binary min-heap that also remembers where each item sits in it.
+# Knowing the position of every item lets us remove an arbitrary item or re-sort it after its key changed
+# in O(log n), which a plain heapq list can't do.
+# Keys have to be unique (e.g. include the pid), since items themselves are never compared.
+class IndexedHeap:
+    def __init__(self, key):
+        self.key = key
+        self.heap = []
+        self.positions = {}
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    def __contains__(self, item) -> bool:
+        return item in self.positions
+
+    # Iterates in heap order, not sorted order.
+    def __iter__(self):
+        return (item for _, item in self.heap)
+
+    def push(self, item):
+        self.heap.append((self.key(item), item))
+        self.positions[item] = len(self.heap) - 1
+        self._sift_up(len(self.heap) - 1)
+
+    def peek(self):
+        return self.heap[0][1]
+
+    def pop(self):
+        item = self.heap[0][1]
+        self._remove_at(0)
+        return item
+
+    def remove(self, item):
+        self._remove_at(self.positions[item])
+
+    # Moves the item to its new place after its key changed.
+    def update(self, item):
+        index = self.positions[item]
+        self.heap[index] = (self.key(item), item)
+        self._sift_up(index)
+        self._sift_down(self.positions[item])
+
+    def _remove_at(self, index: int):
+        del self.positions[self.heap[index][1]]
+        last = self.heap.pop()
+        if index < len(self.heap):
+            self.heap[index] = last
+            self.positions[last[1]] = index
+            self._sift_up(index)
+            self._sift_down(self.positions[last[1]])
+
+    def _sift_up(self, index: int):
+        heap = self.heap
+        entry = heap[index]
+        while index > 0:
+            parent = (index - 1) >> 1
+            if heap[parent][0] <= entry[0]:
+                break
+            heap[index] = heap[parent]
+            self.positions[heap[index][1]] = index
+            index = parent
+        heap[index] = entry
+        self.positions[entry[1]] = index
+
+    def _sift_down(self, index: int):
+        heap = self.heap
+        size = len(heap)
+        entry = heap[index]
+        while True:
+            child = 2 * index + 1
+            if child >= size:
+                break
+            if child + 1 < size and heap[child + 1][0] < heap[child][0]:
+                child += 1
+            if entry[0] <= heap[child][0]:
+                break
+            heap[index] = heap[child]
+            self.positions[heap[index][1]] = index
+            index = child
+        heap[index] = entry
+        self.positions[entry[1]] = index
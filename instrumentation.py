@@ -0,0 +1,245 @@
+from array import array
+import csv
+from dataclasses import dataclass
+from functools import partial
+import json
+from pathlib import Path
+import time
+
+MICRO_S = int
+
+# Monitors attach to one kernel or allocator instance by replacing the methods they watch on that instance with wrappers,
+# so a simulation without monitors runs exactly the code it would without this module and pays nothing for it.
+# The ones that need the simulated time take a clock: anything with an elapsed_time attribute holding it, e.g. the Simulator.
+
+# Writes CSV with the given fields, one row per dict of rows, if the path ends in .csv, and json_payload as JSON otherwise.
+def write_rows(path: Path, fields: list[str], rows: list[dict], json_payload: dict):
+    if Path(path).suffix == ".csv":
+        with open(path, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(path, 'w') as file:
+            json.dump(json_payload, file, indent=4)
+
+MEMORY_STATS_FIELDS = ["time_us", "holes", "free_bytes", "largest_hole", "fragmentation",
+                       "allocations", "failed_allocations", "failure_rate", "frees", "allocate_ns", "free_ns"]
+
+# Samples the state of a memory allocator every interval of simulated time.
+# The allocate and free methods of the allocator instance are wrapped to count and time them.
+# Memory only changes inside allocate and free, so samples are taken lazily: right before each change,
+# and when the results are written, every interval boundary since the last sample is filled in.
+# A sample at time t describes the allocator at the start of tick t.
+#   fragmentation: 1 - largest hole / free bytes (0 when there is a single hole)
+#   failure_rate:  failed allocations / allocations since the previous sample
+# Counters and times are cumulative.
+class AllocatorMonitor:
+    interval: MICRO_S
+    next_sample: MICRO_S
+    allocations: int
+    failed_allocations: int
+    frees: int
+    allocate_ns: int
+    free_ns: int
+
+    def __init__(self, allocator, interval: MICRO_S, clock):
+        assert(interval > 0)
+        self.allocator = allocator
+        self.interval = interval
+        self.clock = clock
+        self.next_sample = 0
+        self.allocations = 0
+        self.failed_allocations = 0
+        self.frees = 0
+        self.allocate_ns = 0
+        self.free_ns = 0
+        self.samples = {field: array('d' if field in ("fragmentation", "failure_rate") else 'q') for field in MEMORY_STATS_FIELDS}
+
+        # The methods of the class are kept rather than bound methods, which would pickle as a lookup of the wrapped attribute.
+        self.allocate = type(allocator).allocate
+        self.free = type(allocator).free
+        allocator.allocate = self.timed_allocate
+        allocator.free = self.timed_free
+
+    def timed_allocate(self, size: int):
+        self.sample_until(self.clock.elapsed_time)
+        start = time.perf_counter_ns()
+        address = self.allocate(self.allocator, size)
+        self.allocate_ns += time.perf_counter_ns() - start
+        self.allocations += 1
+        if address is None:
+            self.failed_allocations += 1
+        return address
+
+    # Takes whatever the allocator's free takes, a start and size or the frames of a process in paging mode.
+    def timed_free(self, *block):
+        self.sample_until(self.clock.elapsed_time)
+        start = time.perf_counter_ns()
+        self.free(self.allocator, *block)
+        self.free_ns += time.perf_counter_ns() - start
+        self.frees += 1
+
+    # Records a sample at every interval boundary up to and including the given time.
+    def sample_until(self, until: MICRO_S):
+        if self.next_sample > until:
+            return
+
+        samples = self.samples
+        free_bytes = self.allocator.free_bytes
+        largest_hole = self.allocator.largest_hole()
+        # Memory can't change while the boundaries of one stretch are filled in.
+        holes = self.allocator.hole_count()
+        fragmentation = 1 - largest_hole / free_bytes if free_bytes > 0 else 0.0
+        previous_allocations = samples["allocations"][-1] if samples["allocations"] else 0
+        previous_failures = samples["failed_allocations"][-1] if samples["failed_allocations"] else 0
+        attempts = self.allocations - previous_allocations
+        failure_rate = (self.failed_allocations - previous_failures) / attempts if attempts > 0 else 0.0
+
+        while self.next_sample <= until:
+            samples["time_us"].append(self.next_sample)
+            samples["holes"].append(holes)
+            samples["free_bytes"].append(free_bytes)
+            samples["largest_hole"].append(largest_hole)
+            samples["fragmentation"].append(fragmentation)
+            samples["allocations"].append(self.allocations)
+            samples["failed_allocations"].append(self.failed_allocations)
+            samples["failure_rate"].append(failure_rate)
+            samples["frees"].append(self.frees)
+            samples["allocate_ns"].append(self.allocate_ns)
+            samples["free_ns"].append(self.free_ns)
+            self.next_sample += self.interval
+            # Later boundaries of the same stretch saw no allocations
+            failure_rate = 0.0
+
+    def rows(self) -> list[dict]:
+        columns = [self.samples[field] for field in MEMORY_STATS_FIELDS]
+        return [dict(zip(MEMORY_STATS_FIELDS, values)) for values in zip(*columns)]
+
+    # Fills in the samples up to the current time, then writes CSV if the path ends in .csv and JSON otherwise.
+    def write(self, path: Path):
+        self.sample_until(self.clock.elapsed_time)
+        rows = self.rows()
+        write_rows(path, MEMORY_STATS_FIELDS, rows, {"interval_us": self.interval, "samples": rows})
+
+# Kernel entry points called by the simulator, in the order they are reported in.
+KERNEL_ENTRY_POINTS = ["new_process_arrived", "syscall_exit", "syscall_set_priority",
+                       "syscall_init_semaphore", "syscall_semaphore_p", "syscall_semaphore_v",
+                       "syscall_init_mutex", "syscall_mutex_lock", "syscall_mutex_unlock",
+                       "timer_interrupt", "next_timer_deadline", "skip_timer_interrupts"]
+# Entry points whose first argument is a semaphore or mutex id, and the table of the kernel that id is looked up in.
+LOCK_TABLES = {
+    "syscall_semaphore_p": "semaphores", "syscall_semaphore_v": "semaphores",
+    "syscall_mutex_lock": "mutexes", "syscall_mutex_unlock": "mutexes",
+}
+PROFILE_FIELDS = ["entry_point", "calls", "total_ns", "mean_ns", "max_ns", "mean_ready", "max_ready", "mean_waiting", "max_waiting"]
+# Root of every folded stack, so the kernel shows up as part of the simulation in a flame graph.
+FOLDED_STACK_ROOT = "Simulator.run_simulator"
+
+# Returns a function that calls an entry point of the kernel instance as it is now, including a wrapper another monitor put there,
+# so monitors can be stacked. It is a partial of the class method rather than a bound method,
+# which would pickle as a lookup of the attribute that is about to be replaced.
+def kernel_entry_point(kernel, name: str):
+    return kernel.__dict__.get(name) or partial(getattr(type(kernel), name), kernel)
+
+# Stands in for one entry point of a profiled kernel instance.
+# A plain object rather than a closure, so a profiled kernel can still be pickled into a checkpoint.
+@dataclass(slots=True)
+class ProfiledCall:
+    profiler: "KernelProfiler"
+    index: int
+    method: object
+    lock_table: str | None
+
+    def __call__(self, *args):
+        profiler = self.profiler
+        kernel = profiler.kernel
+        ready = kernel.scheduler.ready_count()
+        waiting = 0
+        if self.lock_table is not None:
+            lock = getattr(kernel, self.lock_table).get(args[0])
+            if lock is not None:
+                waiting = len(lock["queue"])
+
+        start = time.perf_counter_ns()
+        result = self.method(*args)
+        elapsed = time.perf_counter_ns() - start
+
+        index = self.index
+        profiler.calls[index] += 1
+        profiler.total_ns[index] += elapsed
+        if elapsed > profiler.max_ns[index]:
+            profiler.max_ns[index] = elapsed
+        profiler.ready_total[index] += ready
+        if ready > profiler.ready_max[index]:
+            profiler.ready_max[index] = ready
+        profiler.waiting_total[index] += waiting
+        if waiting > profiler.waiting_max[index]:
+            profiler.waiting_max[index] = waiting
+        return result
+
+# Counts and times every kernel entry point called by the simulator, to find the calls that get slow as a simulation grows.
+# The entry points of the kernel instance are replaced by ProfiledCall objects.
+# Every call records its latency and the lengths of the queues it found:
+#   ready:   processes waiting to run, from the scheduler
+#   waiting: processes blocked on the semaphore or mutex the call is about (only for p/v and lock/unlock)
+# Counters are int64 columns indexed by the position of the entry point in KERNEL_ENTRY_POINTS.
+class KernelProfiler:
+    calls: array
+    total_ns: array
+    max_ns: array
+    ready_total: array
+    ready_max: array
+    waiting_total: array
+    waiting_max: array
+
+    def __init__(self, kernel):
+        self.kernel = kernel
+        for column in ("calls", "total_ns", "max_ns", "ready_total", "ready_max", "waiting_total", "waiting_max"):
+            setattr(self, column, array('q', [0]) * len(KERNEL_ENTRY_POINTS))
+
+        for index, name in enumerate(KERNEL_ENTRY_POINTS):
+            setattr(kernel, name, ProfiledCall(self, index, kernel_entry_point(kernel, name), LOCK_TABLES.get(name)))
+
+    # One row per entry point that was called, the most expensive first.
+    def rows(self) -> list[dict]:
+        rows = []
+        for index, name in enumerate(KERNEL_ENTRY_POINTS):
+            calls = self.calls[index]
+            if calls == 0:
+                continue
+            rows.append({
+                "entry_point": name,
+                "calls": calls,
+                "total_ns": self.total_ns[index],
+                "mean_ns": round(self.total_ns[index] / calls, 1),
+                "max_ns": self.max_ns[index],
+                "mean_ready": round(self.ready_total[index] / calls, 3),
+                "max_ready": self.ready_max[index],
+                "mean_waiting": round(self.waiting_total[index] / calls, 3),
+                "max_waiting": self.waiting_max[index],
+            })
+        rows.sort(key=lambda row: row["total_ns"], reverse=True)
+        return rows
+
+    def report(self) -> str:
+        lines = [f"{'entry point':<24}{'calls':>12}{'total ms':>12}{'mean ns':>12}{'max ns':>12}"
+                 f"{'mean ready':>12}{'max ready':>12}{'mean wait':>12}{'max wait':>12}"]
+        for row in self.rows():
+            lines.append(f"{row['entry_point']:<24}{row['calls']:>12}{row['total_ns'] / 1e6:>12.3f}{row['mean_ns']:>12.1f}{row['max_ns']:>12}"
+                         f"{row['mean_ready']:>12.1f}{row['max_ready']:>12}{row['mean_waiting']:>12.1f}{row['max_waiting']:>12}")
+        return "\n".join(lines) + "\n"
+
+    # Folded stacks as read by flamegraph.pl and speedscope: one line per entry point with its total time in ns.
+    def folded_stacks(self) -> str:
+        return "".join(f"{FOLDED_STACK_ROOT};Kernel.{row['entry_point']} {row['total_ns']}\n" for row in self.rows())
+
+    # Writes folded stacks if the path ends in .folded, CSV if it ends in .csv, JSON if it ends in .json and the text report otherwise.
+    def write(self, path: Path):
+        suffix = Path(path).suffix
+        if suffix in (".csv", ".json"):
+            rows = self.rows()
+            write_rows(path, PROFILE_FIELDS, rows, {"scheduling_algorithm": self.kernel.scheduling_algorithm, "entry_points": rows})
+        else:
+            with open(path, 'w') as file:
+                file.write(self.folded_stacks() if suffix == ".folded" else self.report())
@@ -2,10 +2,23 @@
 # Group id: 10
 # Members: Nathan Chow, Sean Vu, Matthew Monahan
 
-from collections import deque
+from array import array
+
+from allocators import ALLOCATORS, DEFAULT_ALLOCATOR
+from indexed_heap import IndexedHeap
+from paging import FrameAllocator, PagingConfig, TLB
+from schedulers import SCHEDULERS, Scheduler, SchedulerConfig
+
+# NumPy is optional. Without it MMU.translate_many works on plain sequences.
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 # PID is just an integer, but it is used to make it clear when a integer is expected to be a valid PID.
 PID = int
+# Processes see their memory starting at this virtual address.
+VIRTUAL_BASE = 0x20000000
 
 # This class represents the PCB of processes.
 # It is only here for your convinience and can be modified however you see fit.
@@ -15,12 +28,15 @@ class PCB:
     process_type: str
     memory_start: int
     memory_limit: int
+    vruntime: int
+    level: int
 
     def __init__(self, pid: PID, priority: int = 0, process_type: str = "Foreground"):
         self.pid = pid
         self.priority = priority
         self.process_type = process_type
-        self._saved_quantum = None
+        self.level = 0
+        self.vruntime = 0
         self.memory_start = -1
         self.memory_limit = 0
 
@@ -29,345 +45,141 @@ class PCB:
 # DO NOT modify the name of this class or remove it.
 class Kernel:
     scheduling_algorithm: str
-    ready_queue: deque[PCB]
-    waiting_queue: deque[PCB]
-    running: PCB
+    scheduler: Scheduler
     idle_pcb: PCB
 
-    def __init__(self, scheduling_algorithm: str, logger, mmu: "MMU", memory_size: int):
+    def __init__(self, scheduling_algorithm: str, logger, mmu: "MMU", memory_size: int, scheduler_config: SchedulerConfig | None = None,
+                 memory_allocator: str = DEFAULT_ALLOCATOR, paging: PagingConfig | None = None):
         self.scheduling_algorithm = scheduling_algorithm
-        self.ready_queue = deque()
-        self.waiting_queue = deque()
         self.idle_pcb = PCB(0)
-        self.running = self.idle_pcb
         self.logger = logger
 
-        self.quantum = 40
-        self.time = 0
+        if scheduler_config is None:
+            scheduler_config = SchedulerConfig()
         self.semaphores = {}
         self.mutexes = {}
-        
-        self.foreground_queue = deque()  
-        self.background_queue = deque()
-        self.current_queue = "foreground"
-        self.queue_switch_time = 0 
-        self.rr_time = 0
-        self.rr_remaining_time = 0
-        self.process_start_time = 0
+
+        # The policy is picked once here. From then on every scheduling decision goes straight to it.
+        self.scheduler = SCHEDULERS[scheduling_algorithm](self.idle_pcb, scheduler_config)
 
         self.mmu = mmu
         self.mmu.kernel = self
         self.memory_size = memory_size
         self.kernel_memory = 10485760
-        self.free_memory = [(self.kernel_memory, self.memory_size - self.kernel_memory)]
+        self.paging = paging
+        if paging is None:
+            # Placement policy for process memory. Every allocator has the same allocate/free interface.
+            self.allocator = ALLOCATORS[memory_allocator](self.kernel_memory, self.memory_size - self.kernel_memory)
+        else:
+            # In paging mode process memory is a set of page frames, so there is no placement policy.
+            self.allocator = FrameAllocator(self.kernel_memory, self.memory_size - self.kernel_memory, paging.page_size)
+            self.mmu.enable_paging(paging)
         self.process_memory = {}
 
+    @property
+    def running(self) -> PCB:
+        return self.scheduler.running
+
     def new_process_arrived(self, new_process: PID, priority: int, process_type: str, memory_needed: int) -> PID:
-        best_fit_hole = None
-        for start, size in self.free_memory:
-            if size >= memory_needed:
-                if best_fit_hole is None or size < best_fit_hole[1]:
-                    best_fit_hole = (start, size)
-        
-        if best_fit_hole is None:
+        block = self.allocator.allocate(memory_needed)
+        if block is None:
             return -1
 
-        start, size = best_fit_hole
-        self.free_memory.remove(best_fit_hole)
-        
-        if size > memory_needed:
-            self.free_memory.append((start + memory_needed, size - memory_needed))
-            self.free_memory.sort()
-
         new_pcb = PCB(new_process, priority, process_type)
-        new_pcb.memory_start = start
         new_pcb.memory_limit = memory_needed
-        self.process_memory[new_process] = {'start': start, 'limit': memory_needed}
-
-
-        if self.scheduling_algorithm == "FCFS":
-            self.ready_queue.append(new_pcb)
-            if self.running == self.idle_pcb:
-                next_process = self.ready_queue.popleft()
-                self.running = next_process
+        if self.paging is None:
+            new_pcb.memory_start = block
+            self.process_memory[new_process] = {'start': block, 'limit': memory_needed}
+        else:
+            # The block is the page table: the frame of every page of the process.
+            self.process_memory[new_process] = {'page_table': block, 'limit': memory_needed}
+        self.mmu.invalidate(new_process)
 
-        elif self.scheduling_algorithm == "Priority":
-            if (self.running == self.idle_pcb or 
-                new_pcb.priority < self.running.priority or (new_pcb.priority == self.running.priority and new_pcb.pid < self.running.pid)):
-
-                if self.running != self.idle_pcb:
-                    self.ready_queue.append(self.running)
-                self.running = new_pcb
-            else:
-                self.ready_queue.append(new_pcb)
-
-        elif self.scheduling_algorithm == "RR":
-            self.ready_queue.append(new_pcb)
-            if self.running == self.idle_pcb:
-                self.running = self.ready_queue.popleft()
-                self.time = 0
-                
-        elif self.scheduling_algorithm == "Multilevel":
-            if process_type == "Foreground":
-                self.foreground_queue.append(new_pcb)
-            else:
-                self.background_queue.append(new_pcb)
-            if self.running == self.idle_pcb:
-                self.running = self._choose_next_process_multilevel()
-                if self.running != self.idle_pcb:
-                    self.time = 0
-                    self.queue_switch_time = 0
-                    self.process_start_time = 0
-                    if self.running.process_type == "Foreground":
-                        self.current_queue = "foreground"
-                        self.rr_remaining_time = self.quantum
-                    else:
-                        self.current_queue = "background"
-
-        return self.running.pid
+        self.scheduler.process_arrived(new_pcb)
+        return self.scheduler.running.pid
 
     def syscall_exit(self) -> PID:
-        exiting_pid = self.running.pid
+        exiting_pid = self.scheduler.running.pid
         if exiting_pid in self.process_memory:
             mem_info = self.process_memory.pop(exiting_pid)
-            freed_start, freed_size = mem_info['start'], mem_info['limit']
-            
-            new_free_memory = []
-            merged = False
-            for start, size in self.free_memory:
-                if start + size == freed_start:
-                    freed_start, freed_size = start, size + freed_size
-                    merged = True
-                elif freed_start + freed_size == start:
-                    freed_size += size
-                    merged = True
-                else:
-                    new_free_memory.append((start, size))
-
-            new_free_memory.append((freed_start, freed_size))
-            self.free_memory = sorted(new_free_memory)
-            
-            # Second pass for merging after insertion
-            final_free_memory = []
-            if self.free_memory:
-                current_start, current_size = self.free_memory[0]
-                for i in range(1, len(self.free_memory)):
-                    next_start, next_size = self.free_memory[i]
-                    if current_start + current_size == next_start:
-                        current_size += next_size
-                    else:
-                        final_free_memory.append((current_start, current_size))
-                        current_start, current_size = next_start, next_size
-                final_free_memory.append((current_start, current_size))
-                self.free_memory = final_free_memory
-
-
-        if self.scheduling_algorithm == "Multilevel":
-            exit_time = self.rr_time
-            self.running = self._choose_next_process_multilevel()
-            self.process_start_time = exit_time
-        else:
-            self.running = self.choose_next_process()
-        
-        return self.running.pid
+            self.mmu.invalidate(exiting_pid)
+            if self.paging is None:
+                self.allocator.free(mem_info['start'], mem_info['limit'])
+            else:
+                self.allocator.free(mem_info['page_table'])
+                self.mmu.tlb.invalidate(exiting_pid)
+
+        self.scheduler.process_exited()
+        return self.scheduler.running.pid
 
     def syscall_set_priority(self, new_priority: int) -> PID:
-        self.running.priority = new_priority
-
-        if self.scheduling_algorithm == "Priority" and self.ready_queue: 
-            highest_priority = min(
-                self.ready_queue, 
-                key=lambda pcb: (pcb.priority, pcb.pid)
-            )
-
-            if (highest_priority.priority < self.running.priority or 
-                (highest_priority.priority == self.running.priority and highest_priority.pid < self.running.pid)):
-                self.ready_queue.remove(highest_priority)
-                self.ready_queue.append(self.running)
-                self.running = highest_priority
-
-        return self.running.pid
-    
-    def _choose_next_process_multilevel(self):
-        if self.current_queue == "foreground" and len(self.foreground_queue) > 0:
-            selected = self.foreground_queue.popleft()
-            if selected._saved_quantum is not None:
-                self.rr_remaining_time = selected._saved_quantum
-                selected._saved_quantum = None
-            else:
-                self.rr_remaining_time = self.quantum
-            return selected
-        elif self.current_queue == "background" and len(self.background_queue) > 0:
-            return self.background_queue.popleft()
-        elif len(self.foreground_queue) > 0:
-            self.current_queue = "foreground"
-            self.queue_switch_time = 0
-            selected = self.foreground_queue.popleft()
-            if selected._saved_quantum is not None:
-                self.rr_remaining_time = selected._saved_quantum
-                selected._saved_quantum = None
-            else:
-                self.rr_remaining_time = self.quantum
-            return selected
-        elif len(self.background_queue) > 0:
-            self.current_queue = "background"
-            self.queue_switch_time = 0
-            return self.background_queue.popleft()
-
-        return self.idle_pcb
-
-    def choose_next_process(self):
-        if self.scheduling_algorithm == "Multilevel":
-            return self._choose_next_process_multilevel()
-        if len(self.ready_queue) == 0:
-            return self.idle_pcb
-        if self.scheduling_algorithm == "FCFS":
-            return self.ready_queue.popleft()
-        elif self.scheduling_algorithm == "Priority":
-            highest_priority = min(
-                self.ready_queue, 
-                key=lambda pcb: (pcb.priority, pcb.pid)
-            )
-            self.ready_queue.remove(highest_priority)
-            return highest_priority
-        elif self.scheduling_algorithm == "RR":
-            selected = self.ready_queue.popleft()
-            self.time = 0
-            return selected
-        return self.idle_pcb
+        self.scheduler.set_priority(new_priority)
+        return self.scheduler.running.pid
 
     def syscall_init_semaphore(self, semaphore_id: int, initial_value: int):
-        self.semaphores[semaphore_id] = {"value": initial_value, "queue": deque()}
+        # Semaphore and mutex wait queues are heaps so the next process to wake up is always on top.
+        self.semaphores[semaphore_id] = {"value": initial_value, "queue": IndexedHeap(self.scheduler.wait_order)}
 
     def syscall_semaphore_p(self, semaphore_id: int) -> PID:
         sem = self.semaphores[semaphore_id]
+        scheduler = self.scheduler
         if sem["value"] > 0:
             sem["value"] -= 1
         else:
-            sem["queue"].append(self.running)
-            self.running = self.choose_next_process()
-            if self.scheduling_algorithm == "RR":
-                self.time = 0
-        return self.running.pid
+            sem["queue"].push(scheduler.running)
+            scheduler.process_blocked()
+        return scheduler.running.pid
 
     def syscall_semaphore_v(self, semaphore_id: int) -> PID:
         sem = self.semaphores[semaphore_id]
+        scheduler = self.scheduler
         if sem["queue"]:
-            if self.scheduling_algorithm == "Priority":
-                proc = min(sem["queue"], key=lambda pcb: (pcb.priority, pcb.pid))
-                sem["queue"].remove(proc)
-            else:
-                proc = min(sem["queue"], key=lambda pcb: pcb.pid)
-                sem["queue"].remove(proc)
-        
-            if self.scheduling_algorithm == "Multilevel":
-                if proc.process_type == "Foreground":
-                    self.foreground_queue.append(proc)
-                else:
-                    self.background_queue.append(proc)
-            else:
-                if self.scheduling_algorithm == "Priority":
-                    if (proc.priority < self.running.priority or 
-                        (proc.priority == self.running.priority and proc.pid < self.running.pid)):
-                        self.ready_queue.append(self.running)
-                        self.running = proc
-                    else:
-                        self.ready_queue.append(proc)
-                else:
-                    self.ready_queue.append(proc)
+            scheduler.process_woken(sem["queue"].pop())
         else:
             sem["value"] += 1
-        return self.running.pid
+        return scheduler.running.pid
 
     def syscall_init_mutex(self, mutex_id: int):
-        self.mutexes[mutex_id] = {"locked": False, "owner": None, "queue": deque()}
+        self.mutexes[mutex_id] = {"locked": False, "owner": None, "queue": IndexedHeap(self.scheduler.wait_order)}
 
     def syscall_mutex_lock(self, mutex_id: int) -> PID:
         mtx = self.mutexes[mutex_id]
+        scheduler = self.scheduler
         if not mtx["locked"]:
             mtx["locked"] = True
-            mtx["owner"] = self.running
+            mtx["owner"] = scheduler.running
         else:
-            mtx["queue"].append(self.running)
-            self.running = self.choose_next_process()
-            if self.scheduling_algorithm == "RR":
-                self.time = 0
-        return self.running.pid
+            mtx["queue"].push(scheduler.running)
+            scheduler.process_blocked()
+        return scheduler.running.pid
 
     def syscall_mutex_unlock(self, mutex_id: int) -> PID:
         mtx = self.mutexes[mutex_id]
-        if mtx["owner"] == self.running:
+        scheduler = self.scheduler
+        if mtx["owner"] == scheduler.running:
             if mtx["queue"]:
-                if self.scheduling_algorithm == "Priority":
-                    proc = min(mtx["queue"], key=lambda pcb: (pcb.priority, pcb.pid))
-                    mtx["queue"].remove(proc)
-                else:
-                    proc = min(mtx["queue"], key=lambda pcb: pcb.pid)
-                    mtx["queue"].remove(proc)
+                proc = mtx["queue"].pop()
                 mtx["owner"] = proc
-                
-                if self.scheduling_algorithm == "Multilevel":
-                    if proc.process_type == "Foreground":
-                        self.foreground_queue.append(proc)
-                    else:
-                        self.background_queue.append(proc)
-                else:
-                    if self.scheduling_algorithm == "Priority":
-                        if (proc.priority < self.running.priority or 
-                            (proc.priority == self.running.priority and proc.pid < self.running.pid)):
-                            self.ready_queue.append(self.running)
-                            self.running = proc
-                        else:
-                            self.ready_queue.append(proc)
-                    else:
-                        self.ready_queue.append(proc)                   
+                scheduler.process_woken(proc)
             else:
                 mtx["locked"] = False
                 mtx["owner"] = None
-        return self.running.pid
+        return scheduler.running.pid
 
     def timer_interrupt(self) -> PID:
-        if self.scheduling_algorithm == "RR":
-            self.time += 10
-            if self.time >= self.quantum and self.running != self.idle_pcb:
-                self.ready_queue.append(self.running)
-                self.running = self.choose_next_process()
-                self.time = 0
-        elif self.scheduling_algorithm == "Multilevel":
-            self.time += 10
-            self.queue_switch_time += 10
-            
-            need_context_switch = False
-            
-            if (self.running != self.idle_pcb and 
-                self.running.process_type == "Foreground"):
-                self.rr_remaining_time -= 10
-                
-                if self.rr_remaining_time <= 0:
-                    self.foreground_queue.append(self.running)
-                    need_context_switch = True
-            
-            if self.queue_switch_time >= 200:
-                if self.current_queue == "foreground" and len(self.background_queue) > 0:
-                    if (self.running != self.idle_pcb and 
-                        self.running.process_type == "Foreground" and
-                        not need_context_switch):
-                        self.running._saved_quantum = self.rr_remaining_time
-                        self.foreground_queue.appendleft(self.running)
-                    self.current_queue = "background"
-                    need_context_switch = True
-                elif self.current_queue == "background" and len(self.foreground_queue) > 0:
-                    if (self.running != self.idle_pcb and 
-                        self.running.process_type == "Background"):
-                        self.background_queue.appendleft(self.running)
-                    self.current_queue = "foreground"
-                    need_context_switch = True
-                self.queue_switch_time = 0
-
-            if need_context_switch:
-                self.running = self._choose_next_process_multilevel()
-            
-        return self.running.pid
+        self.scheduler.timer_interrupt()
+        return self.scheduler.running.pid
+
+    # Number of timer interrupts, counting from the next one, until one may switch processes or otherwise act.
+    # None if none can before the next syscall or arrival.
+    def next_timer_deadline(self) -> int | None:
+        return self.scheduler.next_timer_deadline()
+
+    # Same as count calls to timer_interrupt, for stretches where none of them acts:
+    # while only the idle process can run, or fewer than next_timer_deadline() interrupts.
+    def skip_timer_interrupts(self, count: int) -> PID:
+        self.scheduler.skip_timer_interrupts(count)
+        return self.scheduler.running.pid
 
 # This class represents the MMU of the simulation.
 # The simulator will create an instance of this object and use it to translate memory accesses.
@@ -376,21 +188,82 @@ class MMU:
     def __init__(self, logger):
         self.logger = logger
         self.kernel = None
-
-    def translate(self, address: int, pid: PID) -> int | None:
-        virtual_base = 0x20000000
-        if address < virtual_base:
+        self.tlb = None
+        self.page_size = 0
+        # Translation of the last process translated for, so runs of accesses by one process skip the lookup in process_memory.
+        # cached_delta turns a virtual address into a physical one and addresses from VIRTUAL_BASE up to cached_end are valid.
+        self.cached_pid = None
+        self.cached_delta = 0
+        self.cached_end = 0
+
+    # Forgets the cached translation of a process whose memory was freed or allocated.
+    def invalidate(self, pid: PID):
+        if self.cached_pid == pid:
+            self.cached_pid = None
+
+    # Switches translation to the page tables of the processes, behind a TLB.
+    def enable_paging(self, paging: PagingConfig):
+        self.tlb = TLB(paging.tlb_sets, paging.tlb_ways)
+        self.page_size = paging.page_size
+        self.translate = self.translate_paged
+
+    def translate_paged(self, address: int, pid: PID) -> int | None:
+        if address < VIRTUAL_BASE or pid not in self.kernel.process_memory:
             return None
 
-        if pid not in self.kernel.process_memory:
+        mem_info = self.kernel.process_memory[pid]
+        offset = address - VIRTUAL_BASE
+        if offset >= mem_info['limit']:
             return None
 
-        mem_info = self.kernel.process_memory[pid]
-        physical_base = mem_info['start']
-        limit = mem_info['limit']
+        page, page_offset = divmod(offset, self.page_size)
+        frame = self.tlb.lookup(pid, page)
+        if frame is None:
+            frame = mem_info['page_table'][page]
+            self.tlb.insert(pid, page, frame)
+        return self.kernel.kernel_memory + frame * self.page_size + page_offset
 
-        offset = address - virtual_base
-        if offset >= limit:
+    def translate(self, address: int, pid: PID) -> int | None:
+        if pid != self.cached_pid and not self._cache_translation(pid):
+            return None
+        if address < VIRTUAL_BASE or address >= self.cached_end:
             return None
-            
-        return physical_base + offset
+        return address + self.cached_delta
+
+    # Translates many addresses of one process in one call.
+    # Returns the physical addresses and a fault mask that is True where the access would segfault.
+    # Faulting entries hold -1. With NumPy the results are NumPy arrays, otherwise an array('q') and a list.
+    # use_numpy=False takes the pure Python path even when NumPy is there, e.g. to check one against the other.
+    def translate_many(self, addresses, pid: PID, use_numpy: bool = True):
+        use_numpy = use_numpy and numpy is not None
+        if self.tlb is not None:
+            # Every access has to go through the TLB in order.
+            physical = array('q', (-1 if (translation := self.translate(address, pid)) is None else translation for address in addresses))
+            faults = [translation == -1 for translation in physical]
+            if use_numpy:
+                return numpy.asarray(physical, dtype=numpy.int64), numpy.asarray(faults, dtype=bool)
+            return physical, faults
+
+        valid = pid == self.cached_pid or self._cache_translation(pid)
+        delta = self.cached_delta
+        end = self.cached_end if valid else VIRTUAL_BASE
+
+        if use_numpy:
+            addresses = numpy.asarray(addresses, dtype=numpy.int64)
+            faults = (addresses < VIRTUAL_BASE) | (addresses >= end)
+            physical = numpy.where(faults, -1, addresses + delta)
+            return physical, faults
+
+        physical = array('q', [address + delta if VIRTUAL_BASE <= address < end else -1 for address in addresses])
+        faults = [translation == -1 for translation in physical]
+        return physical, faults
+
+    # Loads the translation of the process into the cache. Returns False if the process has no memory.
+    def _cache_translation(self, pid: PID) -> bool:
+        mem_info = self.kernel.process_memory.get(pid)
+        if mem_info is None:
+            return False
+        self.cached_pid = pid
+        self.cached_delta = mem_info['start'] - VIRTUAL_BASE
+        self.cached_end = VIRTUAL_BASE + mem_info['limit']
+        return True
@@ -0,0 +1,237 @@
+from dataclasses import dataclass
+from pathlib import Path
+
+from instrumentation import kernel_entry_point, write_rows
+
+MICRO_S = int
+PID = int
+
+SEMAPHORE = "semaphore"
+MUTEX = "mutex"
+
+LOCK_STATS_FIELDS = ["lock", "acquisitions", "contended", "contention_rate", "mean_wait_us", "max_wait_us",
+                     "mean_hold_us", "max_hold_us", "mean_queue_depth", "max_queue_depth"]
+
+# A semaphore or mutex, as (SEMAPHORE or MUTEX, id).
+Lock = tuple[str, int]
+
+def lock_name(lock: Lock) -> str:
+    return f"{lock[0]} {lock[1]}"
+
+# Contention statistics of one lock. Times are simulated us, queue depths count the process that just blocked.
+@dataclass(slots=True)
+class LockStats:
+    acquisitions: int = 0
+    contended: int = 0
+    total_wait: MICRO_S = 0
+    max_wait: MICRO_S = 0
+    releases: int = 0
+    total_hold: MICRO_S = 0
+    max_hold: MICRO_S = 0
+    total_queue_depth: int = 0
+    max_queue_depth: int = 0
+
+# Keeps a wait-for graph of the processes blocked on semaphores and mutexes, and statistics of every lock.
+# The lock syscalls and syscall_exit of the kernel instance are wrapped, and the graph is updated from what each call did
+# to the wait queues and mutex owners.
+# A process waits for the holders of the lock it is blocked on:
+#   mutex:     its owner
+#   semaphore: every process that got past p and hasn't called v since. A v from any process wakes a waiter,
+#              so for semaphores this is the usual guess rather than a certainty.
+# Only the new edges of a process that just blocked can close a cycle, so the graph is only searched from there.
+# A cycle of mutexes can never be broken. It is kept in deadlock, and once nothing else can run the simulator stops with it in its error.
+# A cycle that goes through a semaphore is only a possible deadlock, and is recorded in possible_deadlocks.
+class LockAnalyzer:
+    stats: dict[Lock, LockStats]
+    # Per lock, the pids of its holders with the times they acquired it, oldest first.
+    holders: dict[Lock, dict[PID, list[MICRO_S]]]
+    # Per blocked process, the lock it waits for and since when.
+    waiting: dict[PID, tuple[Lock, MICRO_S]]
+    exited: set[PID]
+    deadlock: str | None
+    possible_deadlocks: list[str]
+
+    def __init__(self, kernel, clock):
+        self.kernel = kernel
+        self.clock = clock
+        self.stats = {}
+        self.holders = {}
+        self.waiting = {}
+        self.exited = set()
+        self.deadlock = None
+        self.possible_deadlocks = []
+
+        self.semaphore_p_call = kernel_entry_point(kernel, "syscall_semaphore_p")
+        self.semaphore_v_call = kernel_entry_point(kernel, "syscall_semaphore_v")
+        self.mutex_lock_call = kernel_entry_point(kernel, "syscall_mutex_lock")
+        self.mutex_unlock_call = kernel_entry_point(kernel, "syscall_mutex_unlock")
+        self.exit_call = kernel_entry_point(kernel, "syscall_exit")
+        kernel.syscall_semaphore_p = self.semaphore_p
+        kernel.syscall_semaphore_v = self.semaphore_v
+        kernel.syscall_mutex_lock = self.mutex_lock
+        kernel.syscall_mutex_unlock = self.mutex_unlock
+        kernel.syscall_exit = self.exit
+
+    def semaphore_p(self, semaphore_id: int) -> PID:
+        pcb = self.kernel.running
+        queue = self.kernel.semaphores[semaphore_id]["queue"]
+        result = self.semaphore_p_call(semaphore_id)
+        self._acquire_or_wait((SEMAPHORE, semaphore_id), pcb.pid, pcb in queue, len(queue))
+        return result
+
+    def semaphore_v(self, semaphore_id: int) -> PID:
+        pid = self.kernel.running.pid
+        queue = self.kernel.semaphores[semaphore_id]["queue"]
+        woken = queue.peek() if queue else None
+        result = self.semaphore_v_call(semaphore_id)
+        lock = (SEMAPHORE, semaphore_id)
+        # A v from a process that isn't a holder just signals.
+        if pid in self.holders.get(lock, ()):
+            self._release(lock, pid)
+        if woken is not None:
+            self._woken(lock, woken.pid)
+        return result
+
+    def mutex_lock(self, mutex_id: int) -> PID:
+        pcb = self.kernel.running
+        queue = self.kernel.mutexes[mutex_id]["queue"]
+        result = self.mutex_lock_call(mutex_id)
+        self._acquire_or_wait((MUTEX, mutex_id), pcb.pid, pcb in queue, len(queue))
+        return result
+
+    def mutex_unlock(self, mutex_id: int) -> PID:
+        pcb = self.kernel.running
+        mutex = self.kernel.mutexes[mutex_id]
+        # The kernel ignores unlocks from anyone but the owner.
+        owned = mutex["owner"] == pcb
+        result = self.mutex_unlock_call(mutex_id)
+        if owned:
+            lock = (MUTEX, mutex_id)
+            self._release(lock, pcb.pid)
+            # Ownership goes straight to the next waiter.
+            if mutex["owner"] is not None:
+                self._woken(lock, mutex["owner"].pid)
+        return result
+
+    # Locks a process holds when it exits stay held, so it is remembered for the reports.
+    def exit(self) -> PID:
+        self.exited.add(self.kernel.running.pid)
+        return self.exit_call()
+
+    def _stats(self, lock: Lock) -> LockStats:
+        stats = self.stats.get(lock)
+        if stats is None:
+            stats = self.stats[lock] = LockStats()
+        return stats
+
+    def _acquire_or_wait(self, lock: Lock, pid: PID, blocked: bool, queue_depth: int):
+        stats = self._stats(lock)
+        if not blocked:
+            stats.acquisitions += 1
+            self.holders.setdefault(lock, {}).setdefault(pid, []).append(self.clock.elapsed_time)
+            return
+
+        stats.contended += 1
+        stats.total_queue_depth += queue_depth
+        stats.max_queue_depth = max(stats.max_queue_depth, queue_depth)
+        self.waiting[pid] = (lock, self.clock.elapsed_time)
+        cycle = self._find_cycle(pid)
+        if cycle is not None:
+            description = "Deadlock: " + " -> ".join(f"pid {pid} -> {lock_name(lock)}" for pid, lock in cycle) + f" -> pid {cycle[0][0]}"
+            if all(lock[0] == MUTEX for _, lock in cycle):
+                if self.deadlock is None:
+                    self.deadlock = f"{description} (at {self.clock.elapsed_time}us)\n" + self.waiting_report(waiter for waiter, _ in cycle)
+            else:
+                self.possible_deadlocks.append(f"at {self.clock.elapsed_time}us: possible {description[0].lower()}{description[1:]}")
+
+    def _woken(self, lock: Lock, pid: PID):
+        _, since = self.waiting.pop(pid)
+        wait = self.clock.elapsed_time - since
+        stats = self.stats[lock]
+        stats.acquisitions += 1
+        stats.total_wait += wait
+        stats.max_wait = max(stats.max_wait, wait)
+        self.holders.setdefault(lock, {}).setdefault(pid, []).append(self.clock.elapsed_time)
+
+    def _release(self, lock: Lock, pid: PID):
+        holders = self.holders[lock]
+        acquired = holders[pid].pop(0)
+        if not holders[pid]:
+            del holders[pid]
+        hold = self.clock.elapsed_time - acquired
+        stats = self.stats[lock]
+        stats.releases += 1
+        stats.total_hold += hold
+        stats.max_hold = max(stats.max_hold, hold)
+
+    # Returns the cycle through a process that just blocked as (pid, lock it waits for) pairs, or None.
+    # Depth first search over the holders of the locks waited for, starting at the new waiter.
+    def _find_cycle(self, start: PID) -> list[tuple[PID, Lock]] | None:
+        path = []
+        visited = set()
+        stack = [(start, iter([start]))]
+        while stack:
+            pid, successors = stack[-1]
+            next_pid = next(successors, None)
+            if next_pid is None:
+                stack.pop()
+                if path:
+                    path.pop()
+                continue
+            if next_pid == start and path:
+                return path
+            if next_pid in visited or next_pid not in self.waiting:
+                continue
+            visited.add(next_pid)
+            lock = self.waiting[next_pid][0]
+            path.append((next_pid, lock))
+            stack.append((next_pid, iter(self.holders.get(lock, {}))))
+        return None
+
+    # One line per blocked process: what it waits for, since when, and who holds it.
+    def waiting_report(self, pids) -> str:
+        lines = []
+        for pid in pids:
+            lock, since = self.waiting[pid]
+            holders = [f"pid {holder}" + (" (exited)" if holder in self.exited else "") for holder in self.holders.get(lock, {})]
+            held_by = ", held by " + ", ".join(holders) if holders else ", not held by anyone"
+            lines.append(f"  pid {pid} waits for {lock_name(lock)} since {since}us{held_by}")
+        return "\n".join(lines)
+
+    # Describes a simulation in which every remaining process is blocked and nothing else will arrive.
+    def all_blocked_report(self, pids) -> str:
+        pids = sorted(pids)
+        lines = [f"Deadlock: all {len(pids)} remaining processes are blocked"]
+        lines.extend(f"  pid {pid} isn't waiting for a semaphore or mutex" for pid in pids if pid not in self.waiting)
+        lines.append(self.waiting_report(pid for pid in pids if pid in self.waiting))
+        return "\n".join(lines)
+
+    def rows(self) -> list[dict]:
+        still_waiting = {}
+        for lock, _ in self.waiting.values():
+            still_waiting[lock] = still_waiting.get(lock, 0) + 1
+
+        rows = []
+        for lock in sorted(self.stats):
+            stats = self.stats[lock]
+            attempts = stats.acquisitions + still_waiting.get(lock, 0)
+            woken = stats.contended - still_waiting.get(lock, 0)
+            rows.append({
+                "lock": lock_name(lock),
+                "acquisitions": stats.acquisitions,
+                "contended": stats.contended,
+                "contention_rate": round(stats.contended / attempts, 6) if attempts > 0 else 0.0,
+                "mean_wait_us": round(stats.total_wait / woken, 3) if woken > 0 else 0.0,
+                "max_wait_us": stats.max_wait,
+                "mean_hold_us": round(stats.total_hold / stats.releases, 3) if stats.releases > 0 else 0.0,
+                "max_hold_us": stats.max_hold,
+                "mean_queue_depth": round(stats.total_queue_depth / stats.contended, 3) if stats.contended > 0 else 0.0,
+                "max_queue_depth": stats.max_queue_depth,
+            })
+        return rows
+
+    # Writes CSV (one row per lock) if the path ends in .csv, and JSON with the locks and any deadlocks otherwise.
+    def write(self, path: Path):
+        rows = self.rows()
+        write_rows(path, LOCK_STATS_FIELDS, rows, {"locks": rows, "deadlock": self.deadlock, "possible_deadlocks": self.possible_deadlocks,
+                                                   "blocked": self.waiting_report(sorted(self.waiting)).splitlines()})
@@ -0,0 +1,119 @@
+from array import array
+from pathlib import Path
+
+from instrumentation import write_rows
+
+MICRO_S = int
+PID = int
+
+# How a process left the simulation.
+STATE_RUNNING = 0
+STATE_FINISHED = 1
+STATE_TRAPPED = 2
+STATE_DROPPED = 3
+STATE_NAMES = ["running", "finished", "trapped", "dropped"]
+
+PROCESS_FIELDS = ["pid", "state", "arrival_us", "first_run_us", "exit_us", "cpu_time_us",
+                  "turnaround_us", "waiting_us", "response_us", "cpu_share", "context_switches"]
+
+# Collects scheduling metrics of every process while the simulation runs, so they don't have to be recovered from the log.
+# Pids are handed out in order starting at 1, so everything is kept in int64 columns indexed by pid - 1.
+# Times that haven't happened yet are -1.
+#   turnaround: exit - arrival
+#   waiting:    turnaround - cpu time, i.e. time spent ready or blocked
+#   response:   first run - arrival
+#   cpu share:  cpu time / turnaround
+# The simulator only calls the collector when metrics were requested, so it costs nothing otherwise.
+class MetricsCollector:
+    states: array
+    arrivals: array
+    first_runs: array
+    exits: array
+    cpu_times: array
+    context_switches: array
+    idle_switches: int
+    process_count: int
+
+    def __init__(self):
+        self.states = array('q')
+        self.arrivals = array('q')
+        self.first_runs = array('q')
+        self.exits = array('q')
+        self.cpu_times = array('q')
+        self.context_switches = array('q')
+        self.idle_switches = 0
+        self.process_count = 0
+
+    # Makes room for count more processes at once, so the columns don't grow one process at a time.
+    # Reserved slots past process_count are not reported.
+    def reserve(self, count: int):
+        for column, value in ((self.states, STATE_RUNNING), (self.arrivals, -1), (self.first_runs, -1),
+                              (self.exits, -1), (self.cpu_times, 0), (self.context_switches, 0)):
+            column.extend(array('q', [value]) * count)
+
+    def process_arrived(self, pid: PID, time: MICRO_S):
+        if pid > len(self.arrivals):
+            self.reserve(max(pid - len(self.arrivals), len(self.arrivals)))
+        self.arrivals[pid - 1] = time
+        self.process_count = max(self.process_count, pid)
+
+    def process_dropped(self, pid: PID, time: MICRO_S):
+        self.states[pid - 1] = STATE_DROPPED
+        self.exits[pid - 1] = time
+
+    def context_switch(self, pid: PID, time: MICRO_S):
+        if pid == 0:
+            self.idle_switches += 1
+            return
+        self.context_switches[pid - 1] += 1
+        if self.first_runs[pid - 1] == -1:
+            self.first_runs[pid - 1] = time
+
+    def process_exited(self, pid: PID, time: MICRO_S, cpu_time: MICRO_S, trapped: bool):
+        self.states[pid - 1] = STATE_TRAPPED if trapped else STATE_FINISHED
+        self.exits[pid - 1] = time
+        self.cpu_times[pid - 1] = cpu_time
+
+    def process_rows(self) -> list[dict]:
+        rows = []
+        for index in range(self.process_count):
+            arrival = self.arrivals[index]
+            first_run = self.first_runs[index]
+            exit = self.exits[index]
+            cpu_time = self.cpu_times[index]
+            turnaround = exit - arrival if exit != -1 else -1
+            rows.append({
+                "pid": index + 1,
+                "state": STATE_NAMES[self.states[index]],
+                "arrival_us": arrival,
+                "first_run_us": first_run,
+                "exit_us": exit,
+                "cpu_time_us": cpu_time,
+                "turnaround_us": turnaround,
+                "waiting_us": turnaround - cpu_time if turnaround != -1 else -1,
+                "response_us": first_run - arrival if first_run != -1 else -1,
+                "cpu_share": round(cpu_time / turnaround, 6) if turnaround > 0 else 0.0,
+                "context_switches": self.context_switches[index],
+            })
+        return rows
+
+    # Means over the processes that ran to completion or trapped. Dropped processes never ran, so they are only counted.
+    def summary(self) -> dict:
+        rows = self.process_rows()
+        completed = [row for row in rows if row["state"] in ("finished", "trapped")]
+        summary = {
+            "processes": len(rows),
+            "finished": sum(1 for row in rows if row["state"] == "finished"),
+            "trapped": sum(1 for row in rows if row["state"] == "trapped"),
+            "dropped": sum(1 for row in rows if row["state"] == "dropped"),
+            "context_switches": sum(row["context_switches"] for row in rows) + self.idle_switches,
+            "idle_switches": self.idle_switches,
+        }
+        for field in ("turnaround_us", "waiting_us", "response_us", "cpu_share"):
+            summary["mean_" + field] = round(sum(row[field] for row in completed) / len(completed), 3) if completed else 0.0
+        return summary
+
+    # Writes CSV (one row per process) if the path ends in .csv, and JSON with the processes and the summary otherwise.
+    def write(self, path: Path):
+        rows = self.process_rows()
+        write_rows(path, PROCESS_FIELDS, rows, {"summary": self.summary(), "processes": rows})
@@ -0,0 +1,118 @@
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+import heapq
+
+PID = int
+
+# Settings of the optional paged memory mode.
+@dataclass(slots=True)
+class PagingConfig:
+    page_size: int = 4096
+    tlb_sets: int = 16
+    tlb_ways: int = 4
+
+# Hands out fixed size page frames of one region of memory.
+# Process memory doesn't have to be contiguous in paging mode, so any free frames will do; the lowest ones are used first.
+# It offers the same statistics as the allocators in allocators.py. There is no external fragmentation with paging,
+# so the largest request that can be placed (largest_hole) is simply all of the free memory.
+# The number of runs of free frames is kept up to date as frames are taken and given back, so hole_count is O(1).
+class FrameAllocator:
+    start: int
+    page_size: int
+    free_frames: list[int]
+    # 1 for every free frame, with a 0 on either end so the neighbours of any frame can be looked up.
+    is_free: bytearray
+    free_runs: int
+    free_bytes: int
+
+    def __init__(self, start: int, size: int, page_size: int):
+        self.start = start
+        self.page_size = page_size
+        # A sorted list is already a valid heap.
+        self.free_frames = list(range(max(size, 0) // page_size))
+        self.is_free = bytearray(b"\0") + bytearray(b"\1") * len(self.free_frames) + bytearray(b"\0")
+        self.free_runs = 1 if self.free_frames else 0
+        self.free_bytes = len(self.free_frames) * page_size
+
+    # Returns the frames backing size bytes, in page order, or None if there aren't enough free frames.
+    def allocate(self, size: int) -> array | None:
+        count = -(-max(size, 0) // self.page_size)
+        if count > len(self.free_frames):
+            return None
+        self.free_bytes -= count * self.page_size
+        frames = array('q', (heapq.heappop(self.free_frames) for _ in range(count)))
+        is_free = self.is_free
+        for frame in frames:
+            # Frame f is at f + 1 in is_free. Taking it splits its run if both neighbours are free, removes it if neither is.
+            is_free[frame + 1] = 0
+            self.free_runs += is_free[frame] + is_free[frame + 2] - 1
+        return frames
+
+    def free(self, frames: array):
+        is_free = self.is_free
+        for frame in frames:
+            heapq.heappush(self.free_frames, frame)
+            is_free[frame + 1] = 1
+            self.free_runs -= is_free[frame] + is_free[frame + 2] - 1
+        self.free_bytes += len(frames) * self.page_size
+
+    # Returns the runs of free frames as (start, size) pairs in address order.
+    def holes(self) -> list[tuple[int, int]]:
+        holes = []
+        for frame in sorted(self.free_frames):
+            address = self.start + frame * self.page_size
+            if holes and holes[-1][0] + holes[-1][1] == address:
+                holes[-1] = (holes[-1][0], holes[-1][1] + self.page_size)
+            else:
+                holes.append((address, self.page_size))
+        return holes
+
+    def hole_count(self) -> int:
+        return self.free_runs
+
+    def largest_hole(self) -> int:
+        return self.free_bytes
+
+# A set-associative TLB with LRU replacement, caching page table entries of the MMU.
+# Entries are tagged with the pid, so processes don't have to flush it on a context switch,
+# only when they exit. A page goes to set page % sets.
+class TLB:
+    sets: list[OrderedDict]
+    ways: int
+    hits: int
+    misses: int
+
+    def __init__(self, sets: int, ways: int):
+        assert(sets > 0 and ways > 0)
+        self.sets = [OrderedDict() for _ in range(sets)]
+        self.ways = ways
+        self.hits = 0
+        self.misses = 0
+
+    # Returns the frame of the page, or None on a miss.
+    def lookup(self, pid: PID, page: int) -> int | None:
+        entries = self.sets[page % len(self.sets)]
+        frame = entries.get((pid, page))
+        if frame is None:
+            self.misses += 1
+            return None
+        entries.move_to_end((pid, page))
+        self.hits += 1
+        return frame
+
+    def insert(self, pid: PID, page: int, frame: int):
+        entries = self.sets[page % len(self.sets)]
+        entries[(pid, page)] = frame
+        if len(entries) > self.ways:
+            # Evict the least recently used entry.
+            entries.popitem(last=False)
+
+    def invalidate(self, pid: PID):
+        for entries in self.sets:
+            for key in [key for key in entries if key[0] == pid]:
+                del entries[key]
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
@@ -0,0 +1,506 @@
+from collections import deque
+from dataclasses import dataclass
+
+from indexed_heap import IndexedHeap
+
+# Order in which the Priority scheduler picks processes: lowest priority number first, ties broken by lowest pid.
+def priority_order(pcb: "PCB") -> tuple[int, int]:
+    return (pcb.priority, pcb.pid)
+
+# Order in which the other schedulers wake up waiting processes: lowest pid first.
+def pid_order(pcb: "PCB") -> int:
+    return pcb.pid
+
+# Tunables of the scheduling policies. The defaults are the values the simulator has always used.
+@dataclass(slots=True)
+class SchedulerConfig:
+    # Time slice of RR and of the Multilevel foreground queue, and the minimum run time of a process under CFS.
+    quantum: int = 40
+    # How often the Multilevel scheduler alternates between its foreground and background queues.
+    queue_switch_period: int = 200
+    # Levels of the Multilevel scheduler, highest first. None is the classic foreground and background pair,
+    # made of quantum and queue_switch_period.
+    levels: list["LevelConfig"] | None = None
+    # Multilevel: a process that uses up its quantum moves down a level.
+    demotion: bool = False
+    # Multilevel: every boost_period us all processes move back to the top level. 0 turns it off.
+    boost_period: int = 0
+
+# This class is the interface between the Kernel and a scheduling policy.
+# The Kernel picks one subclass when it is created and forwards every scheduling decision to it,
+# so adding a policy only means adding a subclass and registering it in SCHEDULERS.
+# The scheduler owns the running PCB and whatever queues of ready processes the policy needs.
+# Processes blocked on a semaphore or mutex are held by the Kernel, in wait queues ordered by wait_order.
+class Scheduler:
+    running: "PCB"
+    idle_pcb: "PCB"
+    config: SchedulerConfig
+    quantum: int
+    wait_order = staticmethod(pid_order)
+
+    def __init__(self, idle_pcb: "PCB", config: SchedulerConfig):
+        self.idle_pcb = idle_pcb
+        self.running = idle_pcb
+        self.config = config
+        self.quantum = config.quantum
+
+    # Returns the next process to run and removes it from the ready queue, or the idle process if nothing is ready.
+    def choose_next_process(self) -> "PCB":
+        raise NotImplementedError
+
+    # A new process was admitted.
+    def process_arrived(self, pcb: "PCB"):
+        raise NotImplementedError
+
+    # A process blocked on a semaphore or mutex is runnable again.
+    def process_woken(self, pcb: "PCB"):
+        raise NotImplementedError
+
+    # The running process exited.
+    def process_exited(self):
+        self.running = self.choose_next_process()
+
+    # The running process blocked on a semaphore or mutex and is now held in its wait queue.
+    def process_blocked(self):
+        self.running = self.choose_next_process()
+
+    def set_priority(self, new_priority: int):
+        self.running.priority = new_priority
+
+    # Number of processes waiting to run, not counting the running one.
+    def ready_count(self) -> int:
+        return len(self.ready_queue)
+
+    def timer_interrupt(self):
+        pass
+
+    # Number of timer interrupts, counting from the next one, until one may do more than update counters
+    # (preempt the running process, or change state that skip_timer_interrupts can't account for).
+    # None if no interrupt can, as long as no other call reaches the scheduler.
+    # Policies that do something in timer_interrupt must override it, together with skip_timer_interrupts.
+    def next_timer_deadline(self) -> int | None:
+        return None
+
+    # Has the effect of count timer interrupts in a row, for stretches where none of them acts:
+    # while the idle process runs and nothing is ready, or when count is below next_timer_deadline().
+    # This lets the simulator skip over them without delivering each one.
+    def skip_timer_interrupts(self, count: int):
+        pass
+
+class FCFSScheduler(Scheduler):
+    ready_queue: deque["PCB"]
+
+    def __init__(self, idle_pcb: "PCB", config: SchedulerConfig):
+        super().__init__(idle_pcb, config)
+        self.ready_queue = deque()
+
+    def choose_next_process(self) -> "PCB":
+        if len(self.ready_queue) == 0:
+            return self.idle_pcb
+        return self.ready_queue.popleft()
+
+    def process_arrived(self, pcb: "PCB"):
+        self.ready_queue.append(pcb)
+        if self.running == self.idle_pcb:
+            self.running = self.ready_queue.popleft()
+
+    def process_woken(self, pcb: "PCB"):
+        self.ready_queue.append(pcb)
+
+class PriorityScheduler(Scheduler):
+    ready_queue: IndexedHeap
+    wait_order = staticmethod(priority_order)
+
+    def __init__(self, idle_pcb: "PCB", config: SchedulerConfig):
+        super().__init__(idle_pcb, config)
+        # The best process is always taken out of the ready queue, so it is kept as a heap.
+        self.ready_queue = IndexedHeap(priority_order)
+
+    def choose_next_process(self) -> "PCB":
+        if len(self.ready_queue) == 0:
+            return self.idle_pcb
+        return self.ready_queue.pop()
+
+    def process_arrived(self, pcb: "PCB"):
+        if (self.running == self.idle_pcb or
+            pcb.priority < self.running.priority or (pcb.priority == self.running.priority and pcb.pid < self.running.pid)):
+
+            if self.running != self.idle_pcb:
+                self.ready_queue.push(self.running)
+            self.running = pcb
+        else:
+            self.ready_queue.push(pcb)
+
+    def process_woken(self, pcb: "PCB"):
+        if (pcb.priority < self.running.priority or
+            (pcb.priority == self.running.priority and pcb.pid < self.running.pid)):
+            self.ready_queue.push(self.running)
+            self.running = pcb
+        else:
+            self.ready_queue.push(pcb)
+
+    def set_priority(self, new_priority: int):
+        self.running.priority = new_priority
+
+        if self.ready_queue:
+            highest_priority = self.ready_queue.peek()
+
+            if (highest_priority.priority < self.running.priority or
+                (highest_priority.priority == self.running.priority and highest_priority.pid < self.running.pid)):
+                self.ready_queue.pop()
+                self.ready_queue.push(self.running)
+                self.running = highest_priority
+
+class RRScheduler(Scheduler):
+    ready_queue: deque["PCB"]
+    time: int
+
+    def __init__(self, idle_pcb: "PCB", config: SchedulerConfig):
+        super().__init__(idle_pcb, config)
+        self.ready_queue = deque()
+        self.time = 0
+
+    def choose_next_process(self) -> "PCB":
+        if len(self.ready_queue) == 0:
+            return self.idle_pcb
+        selected = self.ready_queue.popleft()
+        self.time = 0
+        return selected
+
+    def process_arrived(self, pcb: "PCB"):
+        self.ready_queue.append(pcb)
+        if self.running == self.idle_pcb:
+            self.running = self.ready_queue.popleft()
+            self.time = 0
+
+    def process_woken(self, pcb: "PCB"):
+        self.ready_queue.append(pcb)
+
+    def process_blocked(self):
+        self.running = self.choose_next_process()
+        self.time = 0
+
+    def timer_interrupt(self):
+        self.time += 10
+        if self.time >= self.quantum and self.running != self.idle_pcb:
+            self.ready_queue.append(self.running)
+            self.running = self.choose_next_process()
+            self.time = 0
+
+    def next_timer_deadline(self) -> int | None:
+        if self.running == self.idle_pcb:
+            return None
+        return max(-(-(self.quantum - self.time) // 10), 1)
+
+    def skip_timer_interrupts(self, count: int):
+        self.time += 10 * count
+
+# Levels of the Multilevel scheduler, highest first.
+#   quantum:    time slice of a process in the level (RR), or None to run processes until they block, exit or the level loses the CPU
+#   time_slice: how long the level keeps the CPU before the next level with something to run gets it
+@dataclass(slots=True)
+class LevelConfig:
+    quantum: int | None
+    time_slice: int
+
+# Runtime state of one level.
+# head_remaining is what is left of the quantum of the process at the head of the queue, if it was put back there part way
+# through its quantum because the level lost the CPU. None means the head gets a full quantum.
+@dataclass(slots=True)
+class Level:
+    queue: deque["PCB"]
+    quantum: int | None
+    time_slice: int
+    head_remaining: int | None
+
+# Deadline that is never reached.
+NO_DEADLINE = 2**63 - 1
+
+# Multilevel feedback queue with any number of levels.
+# Foreground processes start in the top level and background processes in the bottom one. Each level is a FIFO queue.
+# The CPU goes around the levels: once the current level has had it for its time slice, it moves on to the next level that has something
+# to run, and a process preempted by that goes back to the head of its level with the rest of its quantum.
+# When the current level runs out of processes, the highest level with something to run gets the CPU and a new slice starts.
+# Optionally, a process that uses up its quantum moves down a level (demotion), and every boost_period all processes
+# move back to the top level (aging).
+# The default configuration is the classic two level scheduler: foreground RR with the quantum and background FCFS,
+# switching every queue_switch_period as long as the other queue has something to run.
+# Everything happens at a deadline: the end of the quantum of the running process, the end of the slice of the current level,
+# or the next boost. Timer interrupts only advance the clock until the earliest deadline is reached.
+class MultilevelScheduler(Scheduler):
+    levels: list[Level]
+    current: int
+    demotion: bool
+    boost_period: int
+    # Time in us, advanced by 10 on every timer interrupt.
+    time: int
+    quantum_end: int
+    slice_end: int
+    next_boost: int
+    next_deadline: int
+
+    def __init__(self, idle_pcb: "PCB", config: SchedulerConfig):
+        super().__init__(idle_pcb, config)
+        level_configs = config.levels
+        if level_configs is None:
+            level_configs = [LevelConfig(config.quantum, config.queue_switch_period), LevelConfig(None, config.queue_switch_period)]
+        self.levels = [Level(deque(), level.quantum, level.time_slice, None) for level in level_configs]
+        self.current = 0
+        self.demotion = config.demotion
+        self.boost_period = config.boost_period
+        self.time = 0
+        self.quantum_end = NO_DEADLINE
+        self.slice_end = self.levels[0].time_slice
+        self.next_boost = config.boost_period if config.boost_period > 0 else NO_DEADLINE
+        self.next_deadline = min(self.slice_end, self.next_boost)
+
+    def choose_next_process(self) -> "PCB":
+        if self.levels[self.current].queue:
+            return self._dispatch(self.current)
+        for index, level in enumerate(self.levels):
+            if level.queue:
+                self.current = index
+                self._start_slice()
+                return self._dispatch(index)
+
+        self.quantum_end = NO_DEADLINE
+        self.next_deadline = min(self.slice_end, self.next_boost)
+        return self.idle_pcb
+
+    def process_arrived(self, pcb: "PCB"):
+        pcb.level = 0 if pcb.process_type == "Foreground" else len(self.levels) - 1
+        self.process_woken(pcb)
+        if self.running == self.idle_pcb:
+            # Nothing else is ready, so this is the process that gets picked, and its level starts a new slice.
+            self.running = self.choose_next_process()
+            self.current = pcb.level
+            self._start_slice()
+
+    def process_woken(self, pcb: "PCB"):
+        self.levels[pcb.level].queue.append(pcb)
+
+    def ready_count(self) -> int:
+        return sum(len(level.queue) for level in self.levels)
+
+    def timer_interrupt(self):
+        self.time += 10
+        if self.time < self.next_deadline:
+            return
+
+        time = self.time
+        running = self.running
+        need_context_switch = False
+
+        if time >= self.quantum_end:
+            if self.demotion and running.level < len(self.levels) - 1:
+                running.level += 1
+            self.levels[running.level].queue.append(running)
+            need_context_switch = True
+
+        if time >= self.next_boost:
+            self._boost(need_context_switch)
+            self.next_boost = time + self.boost_period
+
+        if time >= self.slice_end:
+            next_level = self._next_level()
+            if next_level is not None:
+                if running != self.idle_pcb and not need_context_switch:
+                    level = self.levels[running.level]
+                    level.queue.appendleft(running)
+                    if level.quantum is not None:
+                        level.head_remaining = self.quantum_end - time
+                self.current = next_level
+                need_context_switch = True
+            self._start_slice()
+
+        if need_context_switch:
+            self.running = self.choose_next_process()
+        self.next_deadline = min(self.quantum_end, self.slice_end, self.next_boost)
+
+    # A deadline is handled by the first interrupt at or after it.
+    def next_timer_deadline(self) -> int | None:
+        if self.next_deadline == NO_DEADLINE:
+            return None
+        return max(-(-(self.next_deadline - self.time) // 10), 1)
+
+    # Before the next deadline interrupts only advance the clock.
+    # While idle every level is empty, so the only deadlines that can pass are slice ends and boosts, which just restart the slice.
+    # Since a deadline is handled by the first interrupt at or after it, slices (and boosts) then last a whole number of interrupts.
+    def skip_timer_interrupts(self, count: int):
+        target = self.time + 10 * count
+        if target >= self.next_boost:
+            boost_cycle = 10 * -(-self.boost_period // 10)
+            last_boost = self.time + 10 * -(-(self.next_boost - self.time) // 10)
+            last_boost += boost_cycle * ((target - last_boost) // boost_cycle)
+            self.time = last_boost
+            self.current = 0
+            self._start_slice()
+            self.next_boost = last_boost + self.boost_period
+        if target >= self.slice_end:
+            time_slice = self.levels[self.current].time_slice
+            slice_cycle = 10 * -(-time_slice // 10)
+            slice_start = self.slice_end - time_slice
+            self.slice_end = slice_start + slice_cycle * ((target - slice_start) // slice_cycle) + time_slice
+        self.time = target
+        self.next_deadline = min(self.quantum_end, self.slice_end, self.next_boost)
+
+    # Pops the head of a level and starts its quantum.
+    def _dispatch(self, index: int) -> "PCB":
+        level = self.levels[index]
+        selected = level.queue.popleft()
+        if level.quantum is None:
+            self.quantum_end = NO_DEADLINE
+        elif level.head_remaining is not None:
+            self.quantum_end = self.time + level.head_remaining
+            level.head_remaining = None
+        else:
+            self.quantum_end = self.time + level.quantum
+        self.next_deadline = min(self.quantum_end, self.slice_end, self.next_boost)
+        return selected
+
+    def _start_slice(self):
+        self.slice_end = self.time + self.levels[self.current].time_slice
+        self.next_deadline = min(self.quantum_end, self.slice_end, self.next_boost)
+
+    # The first level after the current one, going around, that has something to run.
+    def _next_level(self) -> int | None:
+        count = len(self.levels)
+        for offset in range(1, count):
+            index = (self.current + offset) % count
+            if self.levels[index].queue:
+                return index
+        return None
+
+    # Moves every process to the top level, lower levels after the ones already there, and gives the running one a new quantum there.
+    # Preempted quanta are forgotten, everyone starts over.
+    def _boost(self, running_queued: bool):
+        top = self.levels[0]
+        for level in self.levels:
+            level.head_remaining = None
+            if level is not top:
+                for pcb in level.queue:
+                    pcb.level = 0
+                top.queue.extend(level.queue)
+                level.queue.clear()
+
+        running = self.running
+        if running != self.idle_pcb and not running_queued:
+            running.level = 0
+            self.quantum_end = self.time + top.quantum if top.quantum is not None else NO_DEADLINE
+        self.current = 0
+        self._start_slice()
+
+# Load weight of each nice level from -20 to 19, as used by Linux (sched_prio_to_weight).
+# Every step is about 1.25x, so one nice level is worth roughly 10% of CPU time.
+NICE_TO_WEIGHT = [
+    88761, 71755, 56483, 46273, 36291, 29154, 23254, 18705, 14949, 11916,
+     9548,  7620,  6100,  4904,  3906,  3121,  2501,  1991,  1586,  1277,
+     1024,   820,   655,   526,   423,   335,   272,   215,   172,   137,
+      110,    87,    70,    56,    45,    36,    29,    23,    18,    15,
+]
+NICE_0_WEIGHT = 1024
+# Priority that maps to nice 0. It is the default priority of the simulator, so processes without a priority get weight 1024.
+CFS_NICE_0_PRIORITY = 32
+
+def cfs_weight(priority: int) -> int:
+    nice = min(max(priority - CFS_NICE_0_PRIORITY, -20), 19)
+    return NICE_TO_WEIGHT[nice + 20]
+
+# Order of the CFS run queue: lowest virtual runtime first, ties broken by lowest pid.
+def vruntime_order(pcb: "PCB") -> tuple[int, int]:
+    return (pcb.vruntime, pcb.pid)
+
+# Completely Fair Scheduler.
+# Every process accumulates virtual runtime while it runs, in ns scaled by NICE_0_WEIGHT / weight,
+# so processes with a lower priority number (a higher weight) age slower and get a bigger share of the CPU.
+# The ready processes are kept ordered by virtual runtime. On a timer interrupt the running process is charged,
+# and once it has run for at least one quantum it is replaced by the leftmost process if that one is behind it.
+# New and woken processes start at min_vruntime, so they can neither starve the others nor be starved by them.
+class CFSScheduler(Scheduler):
+    ready_queue: IndexedHeap
+    min_vruntime: int
+    ran_time: int
+
+    def __init__(self, idle_pcb: "PCB", config: SchedulerConfig):
+        super().__init__(idle_pcb, config)
+        self.ready_queue = IndexedHeap(vruntime_order)
+        self.min_vruntime = 0
+        self.ran_time = 0
+
+    def choose_next_process(self) -> "PCB":
+        self.ran_time = 0
+        if len(self.ready_queue) == 0:
+            return self.idle_pcb
+        selected = self.ready_queue.pop()
+        self.min_vruntime = max(self.min_vruntime, selected.vruntime)
+        return selected
+
+    def process_arrived(self, pcb: "PCB"):
+        pcb.vruntime = self.min_vruntime
+        self._enqueue(pcb)
+
+    def process_woken(self, pcb: "PCB"):
+        pcb.vruntime = max(pcb.vruntime, self.min_vruntime)
+        self._enqueue(pcb)
+
+    def timer_interrupt(self):
+        running = self.running
+        if running == self.idle_pcb:
+            return
+
+        # Runtime is charged a whole interrupt interval (10us) at a time, to whoever is running when the interrupt fires.
+        # The kernel only learns the time through timer interrupts, so the part of an interval a process runs before it
+        # blocks or exits is never charged, and the process it switches to gets charged for the whole interval instead.
+        # Processes that block often can therefore get a little ahead of their fair share, by under one interval per block.
+        running.vruntime += 10000 * NICE_0_WEIGHT // cfs_weight(running.priority)
+        self.ran_time += 10
+
+        if len(self.ready_queue) == 0:
+            self.min_vruntime = max(self.min_vruntime, running.vruntime)
+            return
+
+        leftmost = self.ready_queue.peek()
+        self.min_vruntime = max(self.min_vruntime, min(running.vruntime, leftmost.vruntime))
+        if self.ran_time >= self.quantum and leftmost.vruntime < running.vruntime:
+            self.ready_queue.push(running)
+            self.running = self.choose_next_process()
+
+    # Every interrupt charges the running process, but it can only be preempted once it has used up its quantum
+    # and its virtual runtime has passed that of the leftmost process. Nothing is preempted while nothing else is ready.
+    def next_timer_deadline(self) -> int | None:
+        running = self.running
+        if running == self.idle_pcb or len(self.ready_queue) == 0:
+            return None
+        charge = 10000 * NICE_0_WEIGHT // cfs_weight(running.priority)
+        quantum_interrupts = -(-(self.quantum - self.ran_time) // 10)
+        vruntime_interrupts = (self.ready_queue.peek().vruntime - running.vruntime) // charge + 1
+        return max(quantum_interrupts, vruntime_interrupts, 1)
+
+    # Charges count interrupts at once. min_vruntime only grows, so updating it once at the end gives the same value.
+    # Idle time isn't charged to anyone.
+    def skip_timer_interrupts(self, count: int):
+        running = self.running
+        if running == self.idle_pcb:
+            return
+
+        running.vruntime += count * (10000 * NICE_0_WEIGHT // cfs_weight(running.priority))
+        self.ran_time += 10 * count
+        if len(self.ready_queue) == 0:
+            self.min_vruntime = max(self.min_vruntime, running.vruntime)
+        else:
+            self.min_vruntime = max(self.min_vruntime, min(running.vruntime, self.ready_queue.peek().vruntime))
+
+    def _enqueue(self, pcb: "PCB"):
+        if self.running == self.idle_pcb:
+            self.running = pcb
+            self.ran_time = 0
+        else:
+            self.ready_queue.push(pcb)
+
+SCHEDULERS: dict[str, type[Scheduler]] = {
+    "FCFS": FCFSScheduler,
+    "Priority": PriorityScheduler,
+    "RR": RRScheduler,
+    "Multilevel": MultilevelScheduler,
+    "CFS": CFSScheduler,
+}
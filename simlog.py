@@ -0,0 +1,213 @@
+import os
+import struct
+import sys
+
+MICRO_S = int
+
+# Kinds of records in the simulation log.
+LOG_PROCESS_FINISHED = 0
+LOG_SET_PRIORITY = 1
+LOG_SEMAPHORE_P = 2
+LOG_SEMAPHORE_V = 3
+LOG_MUTEX_LOCK = 4
+LOG_MUTEX_UNLOCK = 5
+LOG_SEGFAULT = 6
+LOG_TRAPPED = 7
+LOG_MEMORY_ACCESS = 8
+LOG_SEMAPHORE_INIT = 9
+LOG_MUTEX_INIT = 10
+LOG_FOREGROUND_ARRIVED = 11
+LOG_BACKGROUND_ARRIVED = 12
+LOG_ALLOCATION_FAILED = 13
+LOG_CONTEXT_SWITCH = 14
+# A free-form message from the kernel (StudentLogger). Its text follows the record in binary traces.
+LOG_STUDENT = 15
+# The blank line that ends every tick with at least one record.
+LOG_SPACING = 16
+
+# Text of every record kind, without the timestamp. Arguments are the pid and the two record arguments.
+TEXT_FORMATS = {
+    LOG_PROCESS_FINISHED: lambda pid, arg, arg2: f"Process {pid} has finished execution and is exiting",
+    LOG_SET_PRIORITY: lambda pid, arg, arg2: f"Process {pid} set priority to {arg}",
+    LOG_SEMAPHORE_P: lambda pid, arg, arg2: f"Process {pid} called p on semaphore {arg}",
+    LOG_SEMAPHORE_V: lambda pid, arg, arg2: f"Process {pid} called v on semaphore {arg}",
+    LOG_MUTEX_LOCK: lambda pid, arg, arg2: f"Process {pid} called lock on mutex {arg}",
+    LOG_MUTEX_UNLOCK: lambda pid, arg, arg2: f"Process {pid} called unlock on mutex {arg}",
+    LOG_SEGFAULT: lambda pid, arg, arg2: f"Process {pid} tried to access virtual address 0x{arg:0x} which caused a segfault",
+    LOG_TRAPPED: lambda pid, arg, arg2: f"Process {pid} has trapped and is forcefully exiting",
+    LOG_MEMORY_ACCESS: lambda pid, arg, arg2: f"Process {pid} accessed virtual address 0x{arg:0x} which translates to physical address 0x{arg2:0x}",
+    LOG_SEMAPHORE_INIT: lambda pid, arg, arg2: f"Semaphore {arg} initilized with value {arg2}",
+    LOG_MUTEX_INIT: lambda pid, arg, arg2: f"Mutex {arg} initilized",
+    # arg is the priority and arg2 the requested memory in whole MB
+    LOG_FOREGROUND_ARRIVED: lambda pid, arg, arg2: f"Foreground process {pid} arrived with priority {arg} requesting {float(arg2)}MB of memory",
+    LOG_BACKGROUND_ARRIVED: lambda pid, arg, arg2: f"Background process {pid} arrived with priority {arg} requesting {float(arg2)}MB of memory",
+    LOG_ALLOCATION_FAILED: lambda pid, arg, arg2: f"Unable to allocate memory for new process. Dropping process.",
+    LOG_CONTEXT_SWITCH: lambda pid, arg, arg2: f"Context switching to pid: {pid}",
+}
+
+# Lines or bytes held in memory before they are written out.
+LOG_BATCH_LINES = 8192
+LOG_BATCH_BYTES = 1 << 20
+
+# Writes the log in the usual text format.
+# Lines are collected and written in batches, and the timestamp is only formatted once per tick.
+class TextLogSink:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'w')
+        self.lines = []
+        self.prefix_time = -1
+        self.prefix = ""
+        self.student_prefix = ""
+
+    def record(self, time: MICRO_S, kind: int, pid: int = 0, arg: int = 0, arg2: int = 0):
+        if time != self.prefix_time:
+            self.set_prefix_time(time)
+        self.lines.append(self.prefix + TEXT_FORMATS[kind](pid, arg, arg2) + "\n")
+        if len(self.lines) >= LOG_BATCH_LINES:
+            self.flush()
+
+    def student(self, time: MICRO_S, message: str):
+        if time != self.prefix_time:
+            self.set_prefix_time(time)
+        self.lines.append(self.student_prefix + message + "\n")
+        if len(self.lines) >= LOG_BATCH_LINES:
+            self.flush()
+
+    def spacing(self):
+        self.lines.append("\n")
+        if len(self.lines) >= LOG_BATCH_LINES:
+            self.flush()
+
+    def set_prefix_time(self, time: MICRO_S):
+        timestamp = f"{time / 1000:.3f}ms"
+        self.prefix_time = time
+        self.prefix = timestamp + " : "
+        self.student_prefix = timestamp + " # "
+
+    def flush(self):
+        self.file.write("".join(self.lines))
+        self.lines.clear()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    # Snapshots keep how much of the log was written instead of the open file. See reopen.
+    def __getstate__(self) -> dict:
+        self.flush()
+        self.file.flush()
+        state = self.__dict__.copy()
+        del state['file']
+        state['offset'] = self.file.tell()
+        return state
+
+    # Continues the log of a restored snapshot: whatever was written after the snapshot is cut off.
+    def reopen(self, path=None):
+        if path is not None:
+            self.path = path
+        os.truncate(self.path, self.offset)
+        self.file = open(self.path, 'a')
+
+# Binary traces start with this, followed by records that start with their kind:
+#   LOG_STUDENT: time and the length of the UTF-8 text that follows
+#   LOG_SPACING: nothing, the kind byte is the whole record
+#   any other:   time, pid, arg and arg2
+BINARY_LOG_MAGIC = b"SIMLOG3\n"
+BINARY_RECORD = struct.Struct("<Bqqqq")
+BINARY_STUDENT = struct.Struct("<BqI")
+BINARY_SPACING = bytes([LOG_SPACING])
+
+# Writes the log as a binary trace, which is several times smaller and cheaper to produce than the text format.
+# Every tick that logged something ends with a blank line, which takes a single byte.
+# convert_binary_log turns a trace back into the text format.
+class BinaryLogSink:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.buffer = bytearray(BINARY_LOG_MAGIC)
+
+    def record(self, time: MICRO_S, kind: int, pid: int = 0, arg: int = 0, arg2: int = 0):
+        self.buffer += BINARY_RECORD.pack(kind, time, pid, arg, arg2)
+        if len(self.buffer) >= LOG_BATCH_BYTES:
+            self.flush()
+
+    def student(self, time: MICRO_S, message: str):
+        text = message.encode()
+        self.buffer += BINARY_STUDENT.pack(LOG_STUDENT, time, len(text))
+        self.buffer += text
+        if len(self.buffer) >= LOG_BATCH_BYTES:
+            self.flush()
+
+    def spacing(self):
+        self.buffer += BINARY_SPACING
+        if len(self.buffer) >= LOG_BATCH_BYTES:
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.buffer)
+        self.buffer.clear()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __getstate__(self) -> dict:
+        self.flush()
+        self.file.flush()
+        state = self.__dict__.copy()
+        del state['file']
+        state['offset'] = self.file.tell()
+        return state
+
+    def reopen(self, path=None):
+        if path is not None:
+            self.path = path
+        os.truncate(self.path, self.offset)
+        self.file = open(self.path, 'ab')
+
+# Reads the trace LOG_BATCH_BYTES at a time and writes the text through a TextLogSink, so memory use doesn't depend on the size of the trace.
+def convert_binary_log(binary_path, text_path):
+    sink = TextLogSink(text_path)
+    with open(binary_path, 'rb') as file:
+        assert(file.read(len(BINARY_LOG_MAGIC)) == BINARY_LOG_MAGIC)
+        data = b""
+        offset = 0
+        for chunk in iter(lambda: file.read(LOG_BATCH_BYTES), b""):
+            # The last record of the previous chunk may have been cut off.
+            data = data[offset:] + chunk
+            offset = convert_records(data, sink)
+        assert(offset == len(data))
+    sink.close()
+
+# Writes every complete record of data to the sink and returns the offset of the first one that isn't.
+def convert_records(data: bytes, sink: TextLogSink) -> int:
+    offset = 0
+    end = len(data)
+    while offset < end:
+        kind = data[offset]
+        if kind == LOG_SPACING:
+            offset += 1
+            sink.spacing()
+        elif kind == LOG_STUDENT:
+            if offset + BINARY_STUDENT.size > end:
+                break
+            _, time, length = BINARY_STUDENT.unpack_from(data, offset)
+            if offset + BINARY_STUDENT.size + length > end:
+                break
+            offset += BINARY_STUDENT.size
+            sink.student(time, data[offset:offset + length].decode())
+            offset += length
+        else:
+            if offset + BINARY_RECORD.size > end:
+                break
+            _, time, pid, arg, arg2 = BINARY_RECORD.unpack_from(data, offset)
+            offset += BINARY_RECORD.size
+            sink.record(time, kind, pid, arg, arg2)
+    return offset
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python simlog.py <binary_log_path> <text_log_path>")
+        sys.exit(1)
+    convert_binary_log(sys.argv[1], sys.argv[2])
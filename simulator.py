@@ -1,19 +1,35 @@
+from array import array
+import argparse
 from io import TextIOWrapper
+import gzip
 import json
 from dataclasses import dataclass
+import os
 from pathlib import Path
-import sys
+import pickle
+import time
 
 from kernel import Kernel, MMU
+from allocators import ALLOCATORS, DEFAULT_ALLOCATOR
+from instrumentation import AllocatorMonitor, KernelProfiler
+from lock_analyzer import LockAnalyzer
+from metrics import MetricsCollector
+from paging import PagingConfig
+from schedulers import LevelConfig, SchedulerConfig
+from simlog import (TextLogSink, BinaryLogSink, LOG_PROCESS_FINISHED, LOG_SET_PRIORITY, LOG_SEMAPHORE_P, LOG_SEMAPHORE_V,
+                    LOG_MUTEX_LOCK, LOG_MUTEX_UNLOCK, LOG_SEGFAULT, LOG_TRAPPED, LOG_MEMORY_ACCESS, LOG_SEMAPHORE_INIT,
+                    LOG_MUTEX_INIT, LOG_FOREGROUND_ARRIVED, LOG_BACKGROUND_ARRIVED, LOG_ALLOCATION_FAILED, LOG_CONTEXT_SWITCH)
 
 MICRO_S = int
 PID = int
 
 NUM_MICRO_IN_SEC: MICRO_S = 1000000
+# Seconds of wall time between two snapshots of a simulation.
+DEFAULT_CHECKPOINT_INTERVAL: float = 300
 TIMER_INTERRUPT_INTERVAL: MICRO_S = 10
 MB_TO_BYTES: int = 1048576
 
-VALID_SCHEDULING_ALGORITHMS = {"FCFS", "Priority", "RR", "Multilevel"}
+VALID_SCHEDULING_ALGORITHMS = {"FCFS", "Priority", "RR", "Multilevel", "CFS"}
 VALID_PROCESS_TYPES = {"Foreground", "Background"}
 
 PROCESSES: str = "processes"
@@ -39,72 +55,236 @@ PROCESS_TYPE: str = "type"
 PROCESS_MEMORY_ACCESS: str = "memory_access"
 PROCESS_MEMORY_NEEDED: str = "needed_memory_MB"
 MEMORY_SIZE: str = "memory_size_MB"
+QUANTUM: str = "quantum"
+QUEUE_SWITCH_PERIOD: str = "queue_switch_period"
+LEVELS: str = "levels"
+LEVEL_QUANTUM: str = "quantum"
+LEVEL_TIME_SLICE: str = "time_slice"
+DEMOTION: str = "demotion"
+BOOST_PERIOD: str = "boost_period"
+MEMORY_ALLOCATOR: str = "memory_allocator"
+PAGING: str = "paging"
+PAGE_SIZE: str = "page_size_KB"
+TLB_SETS: str = "tlb_sets"
+TLB_WAYS: str = "tlb_ways"
 
 DEFAULT_PRIORITY = 32
 
+# Descriptions with this suffix are read as JSON Lines, one process per line, see JsonLinesArrivals.
+JSON_LINES_SUFFIX = ".jsonl"
+
 class SimulationError(Exception):
     pass
 
-@dataclass
-class PriorityChangeEvent:
-    arrival: MICRO_S
-    new_priority: int
-
-@dataclass
-class SemaphoreCallEvent:
-    arrival: MICRO_S
-    id: int
-
-@dataclass
-class MutexEvent:
-    arrival: MICRO_S
-    id: int
-
-@dataclass
+# Kinds of process events. When several events are due in the same tick they are handled in this order.
+EVENT_SET_PRIORITY = 0
+EVENT_SEMAPHORE_P = 1
+EVENT_SEMAPHORE_V = 2
+EVENT_MUTEX_LOCK = 3
+EVENT_MUTEX_UNLOCK = 4
+EVENT_MEMORY_ACCESS = 5
+
+# The pending events of one process, merged into a single stream ordered by time.
+# Instead of an object per event, they are kept in three parallel columns: when the event happens (in CPU time of the process),
+# its kind, and its argument (the new priority, the semaphore or mutex id, or the memory address).
+# The columns are sorted such that their last element is always the next event.
+@dataclass(slots=True)
+class EventStream:
+    arrivals: array
+    kinds: array
+    values: array
+
+# Shared by every process without events. Events are only ever popped from non-empty streams, so it is never modified.
+NO_EVENTS = EventStream(array('q'), array('b'), array('q'))
+
+# Events are given as (arrival, kind, value) tuples.
+def make_event_stream(events: list[tuple[MICRO_S, int, int]]) -> EventStream:
+    if len(events) == 0:
+        return NO_EVENTS
+    # CPU time is at least 1 the first time a process is advanced, so every event at or before 1 is due in that same tick.
+    # Those are clamped to 1 to have them handled in order of kind, same as every other tick with several due events.
+    events = [(max(arrival, 1), kind, arrival, value) for arrival, kind, value in events]
+    events.sort(reverse=True)
+    return EventStream(array('q', [event[0] for event in events]), array('b', [event[1] for event in events]), \
+                       array('q', [event[3] for event in events]))
+
+@dataclass(slots=True)
 class Semaphore:
     init_val: int
     initilized: bool
 
-@dataclass
+@dataclass(slots=True)
 class Mutex:
     initilized: bool
 
-@dataclass
-class MemoryEvent:
-    arrival: MICRO_S
-    address: int
-
-@dataclass
+@dataclass(slots=True)
 class Process:
     arrival: MICRO_S
     total_cpu_time: MICRO_S
     elapsed_cpu_time: MICRO_S
     priority: int
-    priority_change_events: list[PriorityChangeEvent]
-    semaphore_p_events: list[SemaphoreCallEvent]
-    semaphore_v_events: list[SemaphoreCallEvent]
-    mutex_lock_events: list[MutexEvent]
-    mutex_unlock_events: list[MutexEvent]
+    events: EventStream
     process_type: str
     memory_needed: int
-    memory_events: list[MemoryEvent]
+
+# Builds a Process from its entry in the "processes" list of a simulation description.
+def parse_process(process: dict) -> Process:
+    assert(ARRIVAL in process and type(process[ARRIVAL]) is MICRO_S)
+    assert(TOTAL_CPU_TIME in process and type(process[TOTAL_CPU_TIME]) is MICRO_S)
+    
+    priority = DEFAULT_PRIORITY
+    if PRIORITY in process:
+        assert(type(process[PRIORITY]) is int)
+        priority = process[PRIORITY]
+
+    events = []
+    if PRIORITY_CHANGES in process:
+        assert(type(process[PRIORITY_CHANGES]) is list)
+        for change in process[PRIORITY_CHANGES]:
+            assert(EVENT_ARRIVAL in change and type(change[EVENT_ARRIVAL]) is int)
+            assert(NEW_PRIORITY in change and type(change[NEW_PRIORITY]) is int)
+            events.append((change[EVENT_ARRIVAL], EVENT_SET_PRIORITY, change[NEW_PRIORITY]))
+
+    if PROCESS_SEMAPHORE in process:
+        assert(type(process[PROCESS_SEMAPHORE]) is list)
+        for event in process[PROCESS_SEMAPHORE]:
+            assert(PROCESSES_SEMA_ID in event and type(event[PROCESSES_SEMA_ID]) is int)
+            id = event[PROCESSES_SEMA_ID]
+            assert(PROCESS_SEMA_P in event or PROCESS_SEMA_V in event)
+            if PROCESS_SEMA_P in event:
+                assert(type(event[PROCESS_SEMA_P]) is int)
+                events.append((event[PROCESS_SEMA_P], EVENT_SEMAPHORE_P, id))
+            elif PROCESS_SEMA_V in event:
+                assert(type(event[PROCESS_SEMA_V]) is int)
+                events.append((event[PROCESS_SEMA_V], EVENT_SEMAPHORE_V, id))
+
+    if PROCESS_MUTEX in process:
+        assert(type(process[PROCESS_MUTEX]) is list)
+        for event in process[PROCESS_MUTEX]:
+            assert(PROCESSES_MUTEX_ID in event and type(event[PROCESSES_MUTEX_ID]) is int)
+            id = event[PROCESSES_MUTEX_ID]
+            assert(PROCESS_MUTEX_LOCK in event or PROCESS_MUTEX_UNLOCK in event)
+            if PROCESS_MUTEX_LOCK in event:
+                assert(type(event[PROCESS_MUTEX_LOCK]) is int)
+                events.append((event[PROCESS_MUTEX_LOCK], EVENT_MUTEX_LOCK, id))
+            elif PROCESS_MUTEX_UNLOCK in event:
+                assert(type(event[PROCESS_MUTEX_UNLOCK]) is int)
+                events.append((event[PROCESS_MUTEX_UNLOCK], EVENT_MUTEX_UNLOCK, id))
+
+    process_type = "Foreground"
+    if PROCESS_TYPE in process:
+        assert(process[PROCESS_TYPE] in VALID_PROCESS_TYPES)
+        process_type = process[PROCESS_TYPE]
+
+    # Default memory needed
+    memory_needed_mb = 10
+    if PROCESS_MEMORY_NEEDED in process:
+        assert(type(process[PROCESS_MEMORY_NEEDED]) is int)
+        memory_needed_mb = process[PROCESS_MEMORY_NEEDED]
+
+    if PROCESS_MEMORY_ACCESS in process:
+        assert(type(process[PROCESS_MEMORY_ACCESS]) is list)
+        for access_list in process[PROCESS_MEMORY_ACCESS]:
+            assert(type(access_list) is dict)
+            for (address_str, arrival) in access_list.items():
+                assert(type(address_str) is str and type(arrival) is int)
+                try:
+                    address = int(address_str, base=0)
+                except ValueError:
+                    assert(False)
+                # Addresses are stored as int64
+                assert(-2**63 <= address < 2**63)
+                events.append((arrival, EVENT_MEMORY_ACCESS, address))
+
+    assert_events_are_valid_and_not_at_same_time(events, process[TOTAL_CPU_TIME])
+    return Process(process[ARRIVAL], process[TOTAL_CPU_TIME], 0, priority, make_event_stream(events), \
+                   process_type, memory_needed_mb * MB_TO_BYTES)
+
+# Reads a simulation description in JSON Lines form: the first line holds everything except "processes",
+# and every following line holds one process, in order of arrival.
+# Processes are only read and built when the previous arrival time has been reached,
+# so memory use depends on how many processes are alive rather than on the size of the file.
+class JsonLinesArrivals:
+    path: Path
+    file: TextIOWrapper
+    header: dict
+    next_process: dict | None
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.file = open(path, 'r')
+        self.header = self.read_line()
+        assert(type(self.header) is dict and PROCESSES not in self.header)
+        self.next_process = self.read_line()
+
+    def read_line(self) -> dict | None:
+        # readline rather than iterating over the file, which would make tell unusable for snapshots.
+        line = self.file.readline()
+        while line:
+            if line.strip():
+                return json.loads(line)
+            line = self.file.readline()
+        return None
+
+    # Puts every process that arrives at the next arrival time on top of arrivals.
+    # They are pushed in file order, so like with a sorted JSON description, the last one listed is popped first.
+    def read_next_arrivals(self, arrivals: list[Process]):
+        if self.next_process is None:
+            return
+
+        arrival = self.next_process.get(ARRIVAL)
+        while self.next_process is not None and self.next_process.get(ARRIVAL) == arrival:
+            arrivals.append(parse_process(self.next_process))
+            self.next_process = self.read_line()
+
+        if self.next_process is not None:
+            assert(ARRIVAL in self.next_process and type(self.next_process[ARRIVAL]) is MICRO_S)
+            # Processes have to be sorted by arrival, we can't look ahead for earlier ones.
+            assert(self.next_process[ARRIVAL] > arrival)
+
+    def close(self):
+        self.file.close()
+
+    # Snapshots keep the read position instead of the open file. See reopen.
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state['file']
+        state['position'] = self.file.tell()
+        return state
+
+    def reopen(self, path: Path | None = None):
+        if path is not None:
+            self.path = path
+        self.file = open(self.path, 'r')
+        self.file.seek(self.position)
 
 class Simulator:
     elapsed_time: MICRO_S
     current_process: PID
     processes: dict[PID, Process]
     arrivals: list[Process]
+    arrival_source: JsonLinesArrivals | None
     kernel: Kernel
     next_pid: PID
-    simlog: TextIOWrapper
+    simlog: TextLogSink | BinaryLogSink
     needs_spacing: False
     process_0_runtime: MICRO_S
     semaphores: dict[int, Semaphore]
     mutexes: dict[int, Mutex]
     student_logs: "StudentLogger"
     mmu: MMU
-
-    def __init__(self, emulation_description_path: Path, logfile_path: str, student_logs: bool):
+    context_switches: int
+    dropped_processes: int
+    trapped_processes: int
+    metrics: MetricsCollector | None
+    memory_monitor: AllocatorMonitor | None
+    profiler: KernelProfiler | None
+    lock_analyzer: LockAnalyzer | None
+
+    # overrides replaces top level fields of the description, e.g. {"scheduling_algorithm": "RR"}.
+    def __init__(self, emulation_description_path: Path, logfile_path: str, student_logs: bool, binary_log: bool = False,
+                 overrides: dict | None = None, collect_metrics: bool = False, memory_stats_interval: MICRO_S | None = None,
+                 profile: bool = False, analyze_locks: bool = False):
         self.elapsed_time = 0
         self.current_process = 0
         self.processes = dict()
@@ -114,14 +294,25 @@ class Simulator:
         self.process_0_runtime = 0
         self.semaphores = dict()
         self.mutexes = dict()
+        self.context_switches = 0
+        self.dropped_processes = 0
+        self.trapped_processes = 0
+        self.metrics = MetricsCollector() if collect_metrics else None
         if student_logs:
             self.student_logs = StudentLogger(self)
         else:
             self.student_logs = StudentLogger(None)
 
         emulation_json = None
-        with open(emulation_description_path, 'r') as file:
-            emulation_json = json.load(file)
+        if Path(emulation_description_path).suffix == JSON_LINES_SUFFIX:
+            self.arrival_source = JsonLinesArrivals(emulation_description_path)
+            emulation_json = self.arrival_source.header
+        else:
+            self.arrival_source = None
+            with open(emulation_description_path, 'r') as file:
+                emulation_json = json.load(file)
+        if overrides is not None:
+            emulation_json.update(overrides)
 
         if SEMAPHORES in emulation_json:
             assert(type(emulation_json[SEMAPHORES]) is list)
@@ -137,90 +328,16 @@ class Simulator:
                 assert(type(mutex_id) is int)
                 self.mutexes[mutex_id] = Mutex(False)
 
-        assert(PROCESSES in emulation_json and type(emulation_json[PROCESSES]) is list)
-        for process in emulation_json[PROCESSES]:
-            assert(ARRIVAL in process and type(process[ARRIVAL]) is MICRO_S)
-            assert(TOTAL_CPU_TIME in process and type(process[TOTAL_CPU_TIME]) is MICRO_S)
-            
-            priority = DEFAULT_PRIORITY
-            if PRIORITY in process:
-                assert(type(process[PRIORITY]) is int)
-                priority = process[PRIORITY]
-
-            priority_changes = []
-            if PRIORITY_CHANGES in process:
-                assert(type(process[PRIORITY_CHANGES]) is list)
-                for change in process[PRIORITY_CHANGES]:
-                    assert(EVENT_ARRIVAL in change and type(change[EVENT_ARRIVAL]) is int)
-                    assert(NEW_PRIORITY in change and type(change[NEW_PRIORITY]) is int)
-                    priority_changes.append(PriorityChangeEvent(change[EVENT_ARRIVAL], change[NEW_PRIORITY]))
-
-            semaphore_p_events = list()
-            semaphore_v_events = list()
-            if PROCESS_SEMAPHORE in process:
-                assert(type(process[PROCESS_SEMAPHORE]) is list)
-                for event in process[PROCESS_SEMAPHORE]:
-                    assert(PROCESSES_SEMA_ID in event and type(event[PROCESSES_SEMA_ID]) is int)
-                    id = event[PROCESSES_SEMA_ID]
-                    assert(PROCESS_SEMA_P in event or PROCESS_SEMA_V in event)
-                    if PROCESS_SEMA_P in event:
-                        assert(type(event[PROCESS_SEMA_P]) is int)
-                        semaphore_p_events.append(SemaphoreCallEvent(event[PROCESS_SEMA_P], id))
-                    elif PROCESS_SEMA_V in event:
-                        assert(type(event[PROCESS_SEMA_V]) is int)
-                        semaphore_v_events.append(SemaphoreCallEvent(event[PROCESS_SEMA_V], id))
-
-            mutex_lock_events = list()
-            mutex_unlock_events = list()
-            if PROCESS_MUTEX in process:
-                assert(type(process[PROCESS_MUTEX]) is list)
-                for event in process[PROCESS_MUTEX]:
-                    assert(PROCESSES_MUTEX_ID in event and type(event[PROCESSES_MUTEX_ID]) is int)
-                    id = event[PROCESSES_MUTEX_ID]
-                    assert(PROCESS_MUTEX_LOCK in event or PROCESS_MUTEX_UNLOCK in event)
-                    if PROCESS_MUTEX_LOCK in event:
-                        assert(type(event[PROCESS_MUTEX_LOCK]) is int)
-                        mutex_lock_events.append(MutexEvent(event[PROCESS_MUTEX_LOCK], id))
-                    elif PROCESS_MUTEX_UNLOCK in event:
-                        assert(type(event[PROCESS_MUTEX_UNLOCK]) is int)
-                        mutex_unlock_events.append(MutexEvent(event[PROCESS_MUTEX_UNLOCK], id))
-
-            process_type = "Foreground"
-            if PROCESS_TYPE in process:
-                assert(process[PROCESS_TYPE] in VALID_PROCESS_TYPES)
-                process_type = process[PROCESS_TYPE]
-
-            # Default memory needed
-            memory_needed_mb = 10
-            if PROCESS_MEMORY_NEEDED in process:
-                assert(type(process[PROCESS_MEMORY_NEEDED]) is int)
-                memory_needed_mb = process[PROCESS_MEMORY_NEEDED]
-
-            memory_events = []
-            if PROCESS_MEMORY_ACCESS in process:
-                assert(type(process[PROCESS_MEMORY_ACCESS]) is list)
-                for access_list in process[PROCESS_MEMORY_ACCESS]:
-                    assert(type(access_list) is dict)
-                    for (address_str, arrival) in access_list.items():
-                        assert(type(address_str) is str and type(arrival) is int)
-                        try:
-                            address = int(address_str, base=0)
-                        except ValueError:
-                            assert(False)
-                        memory_events.append(MemoryEvent(arrival, address))
-
-            # Sort all event lists such that their last element is always the next event
-            for event_list in [priority_changes, semaphore_p_events, semaphore_v_events, mutex_lock_events, mutex_unlock_events, memory_events]:
-                event_list.sort(key=lambda c: c.arrival, reverse=True)
-
-
-            process = Process(process[ARRIVAL], process[TOTAL_CPU_TIME], 0, priority, priority_changes, \
-                              semaphore_p_events, semaphore_v_events, mutex_lock_events, mutex_unlock_events, \
-                                process_type, memory_needed_mb * MB_TO_BYTES, memory_events)
-            assert_events_are_valid_and_not_at_same_time(process)
-            self.arrivals.append(process)
-        # Sort arrivals so earliest arrivals are at the end.
-        self.arrivals.sort(key=lambda p: p.arrival, reverse=True)
+        if self.arrival_source is not None:
+            self.arrival_source.read_next_arrivals(self.arrivals)
+        else:
+            assert(PROCESSES in emulation_json and type(emulation_json[PROCESSES]) is list)
+            for process in emulation_json[PROCESSES]:
+                self.arrivals.append(parse_process(process))
+            # Sort arrivals so earliest arrivals are at the end.
+            self.arrivals.sort(key=lambda p: p.arrival, reverse=True)
+            if self.metrics is not None:
+                self.metrics.reserve(len(self.arrivals))
 
         # Default memory size
         memory_size_mb = 1000
@@ -229,34 +346,186 @@ class Simulator:
             assert(type(emulation_json[MEMORY_SIZE]) is int)
             memory_size_mb = emulation_json[MEMORY_SIZE]
 
+        scheduler_config = SchedulerConfig()
+        if QUANTUM in emulation_json:
+            assert(type(emulation_json[QUANTUM]) is int and emulation_json[QUANTUM] > 0)
+            scheduler_config.quantum = emulation_json[QUANTUM]
+        if QUEUE_SWITCH_PERIOD in emulation_json:
+            assert(type(emulation_json[QUEUE_SWITCH_PERIOD]) is int and emulation_json[QUEUE_SWITCH_PERIOD] > 0)
+            scheduler_config.queue_switch_period = emulation_json[QUEUE_SWITCH_PERIOD]
+        # Levels of the Multilevel scheduler, highest first. A level without a quantum runs its processes FCFS.
+        if LEVELS in emulation_json:
+            assert(type(emulation_json[LEVELS]) is list and len(emulation_json[LEVELS]) > 0)
+            scheduler_config.levels = []
+            for level in emulation_json[LEVELS]:
+                assert(type(level) is dict)
+                quantum = level.get(LEVEL_QUANTUM)
+                assert(quantum is None or (type(quantum) is int and quantum > 0))
+                assert(LEVEL_TIME_SLICE in level and type(level[LEVEL_TIME_SLICE]) is int and level[LEVEL_TIME_SLICE] > 0)
+                scheduler_config.levels.append(LevelConfig(quantum, level[LEVEL_TIME_SLICE]))
+        if DEMOTION in emulation_json:
+            assert(type(emulation_json[DEMOTION]) is bool)
+            scheduler_config.demotion = emulation_json[DEMOTION]
+        if BOOST_PERIOD in emulation_json:
+            assert(type(emulation_json[BOOST_PERIOD]) is int and emulation_json[BOOST_PERIOD] >= 0)
+            scheduler_config.boost_period = emulation_json[BOOST_PERIOD]
+
+        memory_allocator = DEFAULT_ALLOCATOR
+        if MEMORY_ALLOCATOR in emulation_json:
+            assert(emulation_json[MEMORY_ALLOCATOR] in ALLOCATORS)
+            memory_allocator = emulation_json[MEMORY_ALLOCATOR]
+
+        # Paging replaces the placement policy, so memory_allocator has no effect with it.
+        paging = None
+        if PAGING in emulation_json:
+            assert(type(emulation_json[PAGING]) is bool)
+            if emulation_json[PAGING]:
+                paging = PagingConfig()
+                if PAGE_SIZE in emulation_json:
+                    assert(type(emulation_json[PAGE_SIZE]) is int and emulation_json[PAGE_SIZE] > 0)
+                    paging.page_size = emulation_json[PAGE_SIZE] * 1024
+                if TLB_SETS in emulation_json:
+                    assert(type(emulation_json[TLB_SETS]) is int and emulation_json[TLB_SETS] > 0)
+                    paging.tlb_sets = emulation_json[TLB_SETS]
+                if TLB_WAYS in emulation_json:
+                    assert(type(emulation_json[TLB_WAYS]) is int and emulation_json[TLB_WAYS] > 0)
+                    paging.tlb_ways = emulation_json[TLB_WAYS]
+
         self.mmu = MMU(self.student_logs)
 
         assert("scheduling_algorithm" in emulation_json and emulation_json["scheduling_algorithm"] in VALID_SCHEDULING_ALGORITHMS)
-        self.kernel = Kernel(emulation_json["scheduling_algorithm"], self.student_logs, self.mmu, memory_size_mb * MB_TO_BYTES)
+        self.kernel = Kernel(emulation_json["scheduling_algorithm"], self.student_logs, self.mmu, memory_size_mb * MB_TO_BYTES, scheduler_config,
+                             memory_allocator, paging)
+        if memory_stats_interval is not None:
+            self.memory_monitor = AllocatorMonitor(self.kernel.allocator, memory_stats_interval, self)
+        else:
+            self.memory_monitor = None
+        self.profiler = KernelProfiler(self.kernel) if profile else None
+        self.lock_analyzer = LockAnalyzer(self.kernel, self) if analyze_locks else None
 
-        self.simlog = open(logfile_path, 'w')
+        if binary_log:
+            self.simlog = BinaryLogSink(logfile_path)
+        else:
+            self.simlog = TextLogSink(logfile_path)
 
     
-    def run_simulator(self):
-        # Emulation ends when all processes have finished.
-        while len(self.processes) + len(self.arrivals) > 0:
-            if self.current_process == 0:
-                self.process_0_runtime += 1
-            if self.process_0_runtime >= NUM_MICRO_IN_SEC:
-                raise SimulationError( \
-                """Process 0 (idle process) has been running for 1 second straight. 
+    # With a checkpoint path, a snapshot of the whole simulation is written there every checkpoint_interval seconds of wall time.
+    def run_simulator(self, checkpoint_path: Path | None = None, checkpoint_interval: float = DEFAULT_CHECKPOINT_INTERVAL):
+        next_checkpoint = time.monotonic() + checkpoint_interval
+        # The log is closed even if the simulation fails, so everything buffered up to the failure is written out.
+        try:
+            # Emulation ends when all processes have finished.
+            while len(self.processes) + len(self.arrivals) > 0:
+                # Nothing observable happens before the next event, so jump straight to it.
+                self.fast_forward(self.next_event_time())
+                self.simulate_tick()
+                if self.lock_analyzer is not None:
+                    self.check_for_deadlock()
+                if checkpoint_path is not None and time.monotonic() >= next_checkpoint:
+                    self.checkpoint(checkpoint_path)
+                    next_checkpoint = time.monotonic() + checkpoint_interval
+        finally:
+            if self.arrival_source is not None:
+                self.arrival_source.close()
+            self.simlog.close()
+
+    # Stops the simulation as soon as only the idle process is left to run and nothing else will arrive, instead of waiting for the idle watchdog.
+    # Processes outside a cycle of mutexes the lock analyzer found keep running until then, so the log goes as far as it can.
+    def check_for_deadlock(self):
+        if self.current_process == 0 and len(self.processes) > 0 and len(self.arrivals) == 0:
+            report = self.lock_analyzer.all_blocked_report(self.processes)
+            if self.lock_analyzer.deadlock is not None:
+                report = self.lock_analyzer.deadlock + "\n" + report
+            raise SimulationError(report)
+
+    # Writes a snapshot of the simulation, taken between two ticks.
+    # It holds all of the simulator and kernel state. Open files are replaced by how far they were written or read,
+    # and the log is flushed first so the snapshot matches it. The file is replaced atomically, so a crash while writing
+    # leaves the previous snapshot intact.
+    def checkpoint(self, path: Path):
+        temporary_path = f"{path}.tmp"
+        with gzip.open(temporary_path, 'wb', compresslevel=1) as file:
+            pickle.dump(self, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, path)
+
+    # Restores a snapshot written by checkpoint. The log is cut back to where it was when the snapshot was taken,
+    # so continuing with run_simulator produces exactly the log of an uninterrupted run.
+    # The description and log can be given again if they were moved since.
+    @staticmethod
+    def resume(checkpoint_path: Path, emulation_description_path: Path | None = None, logfile_path: Path | None = None) -> "Simulator":
+        with gzip.open(checkpoint_path, 'rb') as file:
+            simulator = pickle.load(file)
+        simulator.simlog.reopen(logfile_path)
+        if simulator.arrival_source is not None:
+            simulator.arrival_source.reopen(emulation_description_path)
+        return simulator
+
+    # Returns the earliest time at which a tick can do more than advance the clock:
+    # an arrival, a timer interrupt the kernel acts on, an event or exit of the current process, or the idle watchdog firing.
+    # Timer interrupts before the kernel's next timer deadline only update counters in the kernel, and while only the idle
+    # process runs none of them can change anything else, so fast_forward hands the skipped ones to the kernel in one go.
+    def next_event_time(self) -> MICRO_S:
+        elapsed_time = self.elapsed_time
+
+        if self.current_process == 0:
+            # The tick that pushes process_0_runtime to the limit has to run so the watchdog can raise.
+            next_time = elapsed_time + NUM_MICRO_IN_SEC - self.process_0_runtime - 1
+            if len(self.arrivals) > 0 and elapsed_time <= self.arrivals[len(self.arrivals) - 1].arrival < next_time:
+                next_time = self.arrivals[len(self.arrivals) - 1].arrival
+            return max(next_time, elapsed_time)
+
+        current_process = self.processes[self.current_process]
+        next_cpu_time = current_process.total_cpu_time
+        event_arrivals = current_process.events.arrivals
+        if len(event_arrivals) > 0 and event_arrivals[-1] < next_cpu_time:
+            next_cpu_time = event_arrivals[-1]
+
+        # elapsed_cpu_time is incremented at the start of a tick, so the tick that reaches next_cpu_time is one earlier.
+        next_time = elapsed_time + next_cpu_time - current_process.elapsed_cpu_time - 1
+
+        timer_interrupts = self.kernel.next_timer_deadline()
+        if timer_interrupts is not None:
+            next_interrupt = max(-(-elapsed_time // TIMER_INTERRUPT_INTERVAL) * TIMER_INTERRUPT_INTERVAL, TIMER_INTERRUPT_INTERVAL)
+            next_time = min(next_time, next_interrupt + (timer_interrupts - 1) * TIMER_INTERRUPT_INTERVAL)
+
+        if len(self.arrivals) > 0 and elapsed_time <= self.arrivals[len(self.arrivals) - 1].arrival < next_time:
+            next_time = self.arrivals[len(self.arrivals) - 1].arrival
+
+        return max(next_time, elapsed_time)
+
+    # Advances the clock to target_time, accounting for the ticks in between as ones where nothing happens.
+    def fast_forward(self, target_time: MICRO_S):
+        skipped = target_time - self.elapsed_time
+        if skipped <= 0:
+            return
+
+        if self.current_process == 0:
+            self.process_0_runtime += skipped
+        else:
+            self.processes[self.current_process].elapsed_cpu_time += skipped
+        # Timer interrupts of the skipped ticks (every multiple of the interval except 0)
+        timer_interrupts = (target_time - 1) // TIMER_INTERRUPT_INTERVAL - (max(self.elapsed_time, 1) - 1) // TIMER_INTERRUPT_INTERVAL
+        if timer_interrupts > 0:
+            self.switch_process(self.kernel.skip_timer_interrupts(timer_interrupts))
+        self.elapsed_time = target_time
+
+    def simulate_tick(self):
+        if self.current_process == 0:
+            self.process_0_runtime += 1
+        if self.process_0_runtime >= NUM_MICRO_IN_SEC:
+            raise SimulationError( \
+            """Process 0 (idle process) has been running for 1 second straight. 
                 This will not happen in tested simulations and is likely a bug in the kernel.""")
-            
-            self.advance_current_process()
+        
+        self.advance_current_process()
 
-            self.check_for_arrival()
+        self.check_for_arrival()
 
-            if self.elapsed_time != 0 and self.elapsed_time % TIMER_INTERRUPT_INTERVAL == 0:
-                self.switch_process(self.kernel.timer_interrupt())
+        if self.elapsed_time != 0 and self.elapsed_time % TIMER_INTERRUPT_INTERVAL == 0:
+            self.switch_process(self.kernel.timer_interrupt())
 
-            self.log_add_spacing()
-            self.elapsed_time += 1
-        self.simlog.close()
+        self.log_add_spacing()
+        self.elapsed_time += 1
 
     def advance_current_process(self):
         if self.current_process == 0:
@@ -267,62 +536,61 @@ class Simulator:
 
         # If the current_process has finished execution
         if current_process.total_cpu_time <= current_process.elapsed_cpu_time:
-            self.log(f"Process {self.current_process} has finished execution and is exiting")
+            self.log(LOG_PROCESS_FINISHED, self.current_process)
             self.exit_current_process()
             return
 
 
-        event_list = current_process.priority_change_events
-        while len(event_list) > 0 and event_list[len(event_list) - 1].arrival <= current_process.elapsed_cpu_time:
-            priority_change = event_list.pop()
-            self.log(f"Process {self.current_process} set priority to {priority_change.new_priority}")
-            self.switch_process(self.kernel.syscall_set_priority(priority_change.new_priority))
+        elapsed_cpu_time = current_process.elapsed_cpu_time
 
+        # The stream is kept even if the process switches away or exits part way, so every event due this tick is handled.
+        events = current_process.events
+        while len(events.arrivals) > 0 and events.arrivals[-1] <= elapsed_cpu_time:
+            events.arrivals.pop()
+            kind = events.kinds.pop()
+            value = events.values.pop()
 
-        event_list = current_process.semaphore_p_events
-        while len(event_list) > 0 and event_list[len(event_list) - 1].arrival <= current_process.elapsed_cpu_time:
-            semaphore_p = event_list.pop()
-            self.check_semaphore_inited(semaphore_p.id)
-            self.log(f"Process {self.current_process} called p on semaphore {semaphore_p.id}")
-            self.switch_process(self.kernel.syscall_semaphore_p(semaphore_p.id))
-        
-        event_list = current_process.semaphore_v_events
-        while len(event_list) > 0 and event_list[len(event_list) - 1].arrival <= current_process.elapsed_cpu_time:
-            semaphore_v = event_list.pop()
-            self.check_semaphore_inited(semaphore_v.id)
-            self.log(f"Process {self.current_process} called v on semaphore {semaphore_v.id}")
-            self.switch_process(self.kernel.syscall_semaphore_v(semaphore_v.id))
-
-
-        event_list = current_process.mutex_lock_events
-        while len(event_list) > 0 and event_list[len(event_list) - 1].arrival <= current_process.elapsed_cpu_time:
-            mutex_lock = event_list.pop()
-            self.check_mutex_inited(mutex_lock.id)
-            self.log(f"Process {self.current_process} called lock on mutex {mutex_lock.id}")
-            self.switch_process(self.kernel.syscall_mutex_lock(mutex_lock.id))
-        
-        event_list = current_process.mutex_unlock_events
-        while len(event_list) > 0 and event_list[len(event_list) - 1].arrival <= current_process.elapsed_cpu_time:
-            mutex_unlock = event_list.pop()
-            self.check_mutex_inited(mutex_unlock.id)
-            self.log(f"Process {self.current_process} called unlock on mutex {mutex_unlock.id}")
-            self.switch_process(self.kernel.syscall_mutex_unlock(mutex_unlock.id))
-
-        event_list = current_process.memory_events
-        while len(event_list) > 0 and event_list[len(event_list) - 1].arrival <= current_process.elapsed_cpu_time:
-            memory_event = event_list.pop()
-            translation = self.mmu.translate(memory_event.address, self.current_process)
-            if translation is None:
-                self.log(f"Process {self.current_process} tried to access virtual address 0x{memory_event.address:0x} which caused a segfault")
-                self.log(f"Process {self.current_process} has trapped and is forcefully exiting")
-                self.exit_current_process()
-            else:
-                self.log(f"Process {self.current_process} accessed virtual address 0x{memory_event.address:0x} which translates to physical address 0x{translation:0x}")
+            if kind == EVENT_SET_PRIORITY:
+                self.log(LOG_SET_PRIORITY, self.current_process, value)
+                self.switch_process(self.kernel.syscall_set_priority(value))
+
+            elif kind == EVENT_SEMAPHORE_P:
+                self.check_semaphore_inited(value)
+                self.log(LOG_SEMAPHORE_P, self.current_process, value)
+                self.switch_process(self.kernel.syscall_semaphore_p(value))
+
+            elif kind == EVENT_SEMAPHORE_V:
+                self.check_semaphore_inited(value)
+                self.log(LOG_SEMAPHORE_V, self.current_process, value)
+                self.switch_process(self.kernel.syscall_semaphore_v(value))
 
-    def exit_current_process(self):
+            elif kind == EVENT_MUTEX_LOCK:
+                self.check_mutex_inited(value)
+                self.log(LOG_MUTEX_LOCK, self.current_process, value)
+                self.switch_process(self.kernel.syscall_mutex_lock(value))
+
+            elif kind == EVENT_MUTEX_UNLOCK:
+                self.check_mutex_inited(value)
+                self.log(LOG_MUTEX_UNLOCK, self.current_process, value)
+                self.switch_process(self.kernel.syscall_mutex_unlock(value))
+
+            else:
+                translation = self.mmu.translate(value, self.current_process)
+                if translation is None:
+                    self.log(LOG_SEGFAULT, self.current_process, value)
+                    self.log(LOG_TRAPPED, self.current_process)
+                    self.trapped_processes += 1
+                    self.exit_current_process(trapped=True)
+                else:
+                    self.log(LOG_MEMORY_ACCESS, self.current_process, value, translation)
+
+    def exit_current_process(self, trapped: bool = False):
         new_process = self.kernel.syscall_exit()
         if new_process == self.current_process:
             raise SimulationError(f"Attempted to continue execution of exiting process (pid = {self.current_process})")
+
+        if self.metrics is not None:
+            self.metrics.process_exited(self.current_process, self.elapsed_time, self.processes[self.current_process].elapsed_cpu_time, trapped)
         
         del self.processes[self.current_process]
         
@@ -330,24 +598,32 @@ class Simulator:
 
     def check_semaphore_inited(self, id: int):
         if not self.semaphores[id].initilized:
-            self.log(f"Semaphore {id} initilized with value {self.semaphores[id].init_val}")
+            self.log(LOG_SEMAPHORE_INIT, 0, id, self.semaphores[id].init_val)
             self.kernel.syscall_init_semaphore(id, self.semaphores[id].init_val)
             self.semaphores[id].initilized = True
 
     def check_mutex_inited(self, id: int):
         if not self.mutexes[id].initilized:
-            self.log(f"Mutex {id} initilized")
+            self.log(LOG_MUTEX_INIT, 0, id)
             self.kernel.syscall_init_mutex(id)
             self.mutexes[id].initilized = True
 
     def check_for_arrival(self):
         while len(self.arrivals) > 0 and self.arrivals[len(self.arrivals) - 1].arrival == self.elapsed_time:
             new_process = self.arrivals.pop()
+            if len(self.arrivals) == 0 and self.arrival_source is not None:
+                self.arrival_source.read_next_arrivals(self.arrivals)
             self.processes[self.next_pid] = new_process
-            self.log(f"{new_process.process_type} process {self.next_pid} arrived with priority {new_process.priority} requesting {new_process.memory_needed / MB_TO_BYTES}MB of memory")
+            if self.metrics is not None:
+                self.metrics.process_arrived(self.next_pid, self.elapsed_time)
+            arrival_kind = LOG_FOREGROUND_ARRIVED if new_process.process_type == "Foreground" else LOG_BACKGROUND_ARRIVED
+            self.log(arrival_kind, self.next_pid, new_process.priority, new_process.memory_needed // MB_TO_BYTES)
             kernel_response = self.kernel.new_process_arrived(self.next_pid, new_process.priority, new_process.process_type, new_process.memory_needed)
             if kernel_response == -1:
-                self.log(f"Unable to allocate memory for new process. Dropping process.")
+                self.log(LOG_ALLOCATION_FAILED)
+                self.dropped_processes += 1
+                if self.metrics is not None:
+                    self.metrics.process_dropped(self.next_pid, self.elapsed_time)
                 del self.processes[self.next_pid]
             else:
                 self.switch_process(kernel_response)
@@ -361,20 +637,24 @@ class Simulator:
             self.process_0_runtime = 0
 
         if new_process != self.current_process:
-            self.log(f"Context switching to pid: {new_process}")
+            self.log(LOG_CONTEXT_SWITCH, new_process)
+            self.context_switches += 1
+            if self.metrics is not None:
+                self.metrics.context_switch(new_process, self.elapsed_time)
         self.current_process = new_process
 
-    def log(self, str: str, student_log = False):
-        if student_log:
-            delimiter = '#'
-        else:
-            delimiter = ':'
-        self.simlog.write(f"{self.elapsed_time / 1000:.3f}ms {delimiter} {str}\n")
+    # Records are kept structured (kind, pid and up to two arguments) and only turned into text by the log sink.
+    def log(self, kind: int, pid: PID = 0, arg: int = 0, arg2: int = 0):
+        self.simlog.record(self.elapsed_time, kind, pid, arg, arg2)
+        self.needs_spacing = True
+
+    def log_student(self, str: str):
+        self.simlog.student(self.elapsed_time, str)
         self.needs_spacing = True
     
     def log_add_spacing(self):
         if self.needs_spacing:
-            self.simlog.write("\n")
+            self.simlog.spacing()
             self.needs_spacing = False
 
 class StudentLogger:
@@ -385,60 +665,64 @@ class StudentLogger:
 
     def log(self, str: str):
         if self.__simluator is not None:
-            self.__simluator.log(str, student_log=True)
+            self.__simluator.log_student(str)
 
 # Having events at the same time as other events in the same process could cause a desync between what the simulator thinks is running and what the handler does.
 # This assert ensures the process does not have this issue.
 # Additionally ensures that all events will happen before the process exits.
-def assert_events_are_valid_and_not_at_same_time(process: Process):
+def assert_events_are_valid_and_not_at_same_time(events: list[tuple[MICRO_S, int, int]], total_cpu_time: MICRO_S):
     event_arrivals = set()
-    for event in process.priority_change_events:
-        assert(event.arrival not in event_arrivals)
-        event_arrivals.add(event.arrival)
-    
-    for event in process.semaphore_p_events:
-        assert(event.arrival not in event_arrivals)
-        event_arrivals.add(event.arrival)
-    
-    for event in process.semaphore_v_events:
-        assert(event.arrival not in event_arrivals)
-        event_arrivals.add(event.arrival)
-
-    for event in process.mutex_lock_events:
-        assert(event.arrival not in event_arrivals)
-        event_arrivals.add(event.arrival)
-    
-    for event in process.mutex_unlock_events:
-        assert(event.arrival not in event_arrivals)
-        event_arrivals.add(event.arrival)
-    
-    for event in process.memory_events:
-        assert(event.arrival not in event_arrivals)
-        event_arrivals.add(event.arrival)
+    for arrival, _, _ in events:
+        assert(arrival not in event_arrivals)
+        event_arrivals.add(arrival)
 
     for event_arrival in event_arrivals:
-        assert(event_arrival < process.total_cpu_time)
-
-def print_usage():
-    print("Usage: python simulator.py <simulation_description_path> <log_path> <optional --no-student-logs>")
-    sys.exit(1)
-
+        assert(event_arrival < total_cpu_time)
 
 if __name__ == "__main__":
-    student_logs = True
-    if len(sys.argv) <= 2 or len(sys.argv) >= 5:
-        print_usage()
-    if type(sys.argv[1]) is not str or type(sys.argv[2]) is not str:
-        print_usage()
-    if len(sys.argv) == 4:
-        if sys.argv[3] != "--no-student-logs":
-            print_usage()
-        else:
-            student_logs = False
-
-
-
-    sim_description = Path(sys.argv[1])
-    log_path = Path(sys.argv[2])
-    simulator = Simulator(sim_description, log_path, student_logs)
-    simulator.run_simulator()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Simulates a kernel running the processes of a simulation description.")
+    parser.add_argument("simulation_description_path", type=Path, help="JSON description, or JSON Lines if it ends in .jsonl")
+    parser.add_argument("log_path", type=Path)
+    parser.add_argument("--no-student-logs", action="store_true", help="leave out the messages logged by the kernel")
+    parser.add_argument("--binary-log", action="store_true", help="write a binary trace instead of text, convert it with simlog.py")
+    parser.add_argument("--metrics", type=Path, help="write per process scheduling metrics to this file (.csv for CSV, JSON otherwise)")
+    parser.add_argument("--memory-stats", type=Path, help="write a time series of allocator statistics to this file (.csv for CSV, JSON otherwise)")
+    parser.add_argument("--memory-stats-interval", type=int, default=1000, help="simulated us between memory statistics samples (default: 1000)")
+    parser.add_argument("--profile", type=Path, help="write the call counts, latencies and queue lengths of every kernel entry point to this file "
+                        "(.folded for flame graph stacks, .csv, .json, a text report otherwise)")
+    parser.add_argument("--lock-stats", type=Path, help="detect deadlocks as they happen and write per lock contention statistics to this file "
+                        "(.csv for CSV, JSON with the deadlocks otherwise); the run stops once every remaining process is blocked, "
+                        "and the file is written even then")
+    parser.add_argument("--checkpoint", type=Path, help="periodically write a snapshot of the simulation to this file")
+    parser.add_argument("--checkpoint-interval", type=float, default=DEFAULT_CHECKPOINT_INTERVAL,
+                        help=f"seconds of wall time between snapshots (default: {DEFAULT_CHECKPOINT_INTERVAL:g})")
+    parser.add_argument("--resume", type=Path, help="continue the run saved in this snapshot; the other settings come from the snapshot")
+    args = parser.parse_args()
+
+    if args.resume is not None:
+        simulator = Simulator.resume(args.resume, args.simulation_description_path, args.log_path)
+        if args.metrics is not None and simulator.metrics is None:
+            parser.error("--metrics needs a snapshot of a run started with --metrics")
+        if args.memory_stats is not None and simulator.memory_monitor is None:
+            parser.error("--memory-stats needs a snapshot of a run started with --memory-stats")
+        if args.profile is not None and simulator.profiler is None:
+            parser.error("--profile needs a snapshot of a run started with --profile")
+        if args.lock_stats is not None and simulator.lock_analyzer is None:
+            parser.error("--lock-stats needs a snapshot of a run started with --lock-stats")
+    else:
+        simulator = Simulator(args.simulation_description_path, args.log_path, not args.no_student_logs, args.binary_log,
+                              collect_metrics=args.metrics is not None,
+                              memory_stats_interval=args.memory_stats_interval if args.memory_stats is not None else None,
+                              profile=args.profile is not None, analyze_locks=args.lock_stats is not None)
+    try:
+        simulator.run_simulator(args.checkpoint, args.checkpoint_interval)
+    finally:
+        # The lock statistics explain a deadlock, so they are written even when the run stops with one.
+        if args.lock_stats is not None:
+            simulator.lock_analyzer.write(args.lock_stats)
+    if args.metrics is not None:
+        simulator.metrics.write(args.metrics)
+    if args.memory_stats is not None:
+        simulator.memory_monitor.write(args.memory_stats)
+    if args.profile is not None:
+        simulator.profiler.write(args.profile)
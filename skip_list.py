@@ -0,0 +1,99 @@
+import random
+
+MAX_LEVEL = 32
+
+# A sorted set kept as a skip list, so adding, removing and finding the neighbours of a key all take O(log n) expected time,
+# where a sorted Python list pays a memmove of the whole tail on every insert and delete.
+# Every node is a list: the key followed by the next node on each of its levels. Levels are drawn from a seeded generator,
+# so they only change how fast the list is, never what it holds.
+class SkipList:
+    def __init__(self, seed: int = 0):
+        self.random = random.Random(seed)
+        self.head = [None] + [None] * MAX_LEVEL
+        self.level = 1
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self):
+        node = self.head[1]
+        while node is not None:
+            yield node[0]
+            node = node[1]
+
+    # Iterates over the keys that are at least key, in order.
+    def iter_from(self, key):
+        node = self._predecessors(key)[0][1]
+        while node is not None:
+            yield node[0]
+            node = node[1]
+
+    def add(self, key):
+        predecessors = self._predecessors(key)
+        bits = self.random.getrandbits(MAX_LEVEL - 1)
+        # One level more for every trailing one bit, i.e. level l with probability 2^-l.
+        level = (~bits & (bits + 1)).bit_length()
+        if level > self.level:
+            predecessors.extend([self.head] * (level - self.level))
+            self.level = level
+        node = [key] + [None] * level
+        for index in range(1, level + 1):
+            node[index] = predecessors[index - 1][index]
+            predecessors[index - 1][index] = node
+        self.size += 1
+
+    # The key has to be in the list.
+    def remove(self, key):
+        predecessors = self._predecessors(key)
+        node = predecessors[0][1]
+        assert(node is not None and node[0] == key)
+        for index in range(1, len(node)):
+            predecessors[index - 1][index] = node[index]
+        while self.level > 1 and self.head[self.level] is None:
+            self.level -= 1
+        self.size -= 1
+
+    # Smallest key that is at least key, or None.
+    def ceiling(self, key):
+        node = self._predecessors(key)[0][1]
+        return node[0] if node is not None else None
+
+    # Largest key that is at most key, or None.
+    def floor(self, key):
+        node = self.head
+        for index in range(self.level, 0, -1):
+            while node[index] is not None and node[index][0] <= key:
+                node = node[index]
+        return node[0] if node is not self.head else None
+
+    # Largest key, or None.
+    def last(self):
+        node = self.head
+        for index in range(self.level, 0, -1):
+            while node[index] is not None:
+                node = node[index]
+        return node[0] if node is not self.head else None
+
+    # For every level from the bottom up, the last node whose key is less than key.
+    def _predecessors(self, key) -> list[list]:
+        predecessors = [None] * self.level
+        node = self.head
+        for index in range(self.level, 0, -1):
+            while node[index] is not None and node[index][0] < key:
+                node = node[index]
+            predecessors[index - 1] = node
+        return predecessors
+
+    # The nodes are nested lists as deep as the list is long, which pickle would recurse into,
+    # so snapshots keep the keys and the list is rebuilt from them.
+    def __getstate__(self) -> dict:
+        return {"random": self.random, "keys": list(self)}
+
+    def __setstate__(self, state: dict):
+        self.random = state["random"]
+        self.head = [None] + [None] * MAX_LEVEL
+        self.level = 1
+        self.size = 0
+        for key in state["keys"]:
+            self.add(key)
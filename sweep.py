@@ -0,0 +1,117 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import csv
+import itertools
+import os
+from pathlib import Path
+import sys
+import time
+
+from allocators import ALLOCATORS
+from simulator import (Simulator, MEMORY_SIZE, MEMORY_ALLOCATOR, PAGE_SIZE, PAGING, QUANTUM, QUEUE_SWITCH_PERIOD, VALID_SCHEDULING_ALGORITHMS)
+
+SCHEDULING_ALGORITHM = "scheduling_algorithm"
+
+# Description fields that can be swept, in the order they appear in the CSV.
+SWEEP_FIELDS = [MEMORY_SIZE, MEMORY_ALLOCATOR, PAGE_SIZE, SCHEDULING_ALGORITHM, QUANTUM, QUEUE_SWITCH_PERIOD]
+RESULT_FIELDS = ["status", "makespan_ms", "context_switches", "dropped_processes", "trapped_processes",
+                 "mean_turnaround_us", "mean_waiting_us", "mean_response_us", "tlb_hits", "tlb_misses", "tlb_hit_rate", "wall_seconds"]
+
+# Returns one dict of overrides per point of the grid. Fields without values keep what the base description says.
+# Sweeping the page size turns paging on.
+def make_grid(axes: dict[str, list]) -> list[dict]:
+    fields = [field for field in SWEEP_FIELDS if axes.get(field)]
+    grid = [dict(zip(fields, values)) for values in itertools.product(*(axes[field] for field in fields))]
+    if PAGE_SIZE in fields:
+        for overrides in grid:
+            overrides[PAGING] = True
+    return grid
+
+# Runs in a worker process and returns one row of the CSV.
+def run_point(description_path: Path, overrides: dict, log_path: str, student_logs: bool) -> dict:
+    row = {field: overrides.get(field, "") for field in SWEEP_FIELDS}
+    start = time.perf_counter()
+    try:
+        simulator = Simulator(description_path, log_path, student_logs, overrides=overrides, collect_metrics=True)
+        simulator.run_simulator()
+    except AssertionError:
+        row["status"] = "invalid simulation description"
+        return row
+    except Exception as error:
+        row["status"] = f"{type(error).__name__}: {' '.join(str(error).split())}"
+        return row
+
+    row["status"] = "ok"
+    row["makespan_ms"] = simulator.elapsed_time / 1000
+    row["context_switches"] = simulator.context_switches
+    row["dropped_processes"] = simulator.dropped_processes
+    row["trapped_processes"] = simulator.trapped_processes
+    summary = simulator.metrics.summary()
+    for field in ("mean_turnaround_us", "mean_waiting_us", "mean_response_us"):
+        row[field] = summary[field]
+    tlb = simulator.mmu.tlb
+    if tlb is not None:
+        row["tlb_hits"] = tlb.hits
+        row["tlb_misses"] = tlb.misses
+        row["tlb_hit_rate"] = round(tlb.hit_rate(), 6)
+    row["wall_seconds"] = round(time.perf_counter() - start, 6)
+    return row
+
+# Runs every point of the grid in parallel and returns the rows in grid order.
+# Logs are thrown away unless log_dir is given, in which case each point gets <index>.log.
+def run_sweep(description_path: Path, grid: list[dict], log_dir: Path | None, student_logs: bool, workers: int | None) -> list[dict]:
+    rows = [None] * len(grid)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for index, overrides in enumerate(grid):
+            log_path = os.devnull if log_dir is None else str(log_dir / f"{index:05}.log")
+            futures[executor.submit(run_point, description_path, overrides, log_path, student_logs)] = index
+
+        for done, future in enumerate(as_completed(futures), 1):
+            index = futures[future]
+            try:
+                rows[index] = future.result()
+            except Exception as error:
+                # The worker itself died (e.g. it was killed), the other points still count.
+                rows[index] = {field: grid[index].get(field, "") for field in SWEEP_FIELDS}
+                rows[index]["status"] = f"worker failed: {type(error).__name__}: {' '.join(str(error).split())}"
+            print(f"[{done}/{len(grid)}] {grid[index]}: {rows[index]['status']}", file=sys.stderr, flush=True)
+    return rows
+
+def write_csv(rows: list[dict], file):
+    writer = csv.DictWriter(file, fieldnames=SWEEP_FIELDS + RESULT_FIELDS, restval="")
+    writer.writeheader()
+    writer.writerows(rows)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runs one simulation description over a grid of settings and writes a CSV of the results.")
+    parser.add_argument("description", type=Path, help="base simulation description (.json or .jsonl)")
+    parser.add_argument("--memory-size-mb", type=int, nargs="+", help="values of memory_size_MB")
+    parser.add_argument("--memory-allocator", nargs="+", choices=sorted(ALLOCATORS), help="values of memory_allocator")
+    parser.add_argument("--page-size-kb", type=int, nargs="+", help="values of page_size_KB, runs the points with paging on")
+    parser.add_argument("--scheduling-algorithm", nargs="+", choices=sorted(VALID_SCHEDULING_ALGORITHMS), help="values of scheduling_algorithm")
+    parser.add_argument("--quantum", type=int, nargs="+", help="values of quantum in us")
+    parser.add_argument("--queue-switch-period", type=int, nargs="+", help="values of queue_switch_period in us (Multilevel)")
+    parser.add_argument("--output", type=Path, help="CSV file to write (default: stdout)")
+    parser.add_argument("--log-dir", type=Path, help="keep the log of every point in this directory")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes (default: one per core)")
+    parser.add_argument("--no-student-logs", action="store_true", help="leave out the messages logged by the kernel")
+    args = parser.parse_args()
+
+    grid = make_grid({
+        MEMORY_SIZE: args.memory_size_mb,
+        MEMORY_ALLOCATOR: args.memory_allocator,
+        PAGE_SIZE: args.page_size_kb,
+        SCHEDULING_ALGORITHM: args.scheduling_algorithm,
+        QUANTUM: args.quantum,
+        QUEUE_SWITCH_PERIOD: args.queue_switch_period,
+    })
+    if args.log_dir is not None:
+        args.log_dir.mkdir(parents=True, exist_ok=True)
+
+    rows = run_sweep(args.description, grid, args.log_dir, not args.no_student_logs, args.workers)
+    if args.output is None:
+        write_csv(rows, sys.stdout)
+    else:
+        with open(args.output, 'w', newline='') as file:
+            write_csv(rows, file)
@@ -0,0 +1,145 @@
+import random
+
+import pytest
+
+from allocators import ALLOCATORS, BestFitAllocator, BuddyAllocator
+
+START = 100
+
+def test_buddy_split():
+    allocator = BuddyAllocator(START, 1024)
+    assert allocator.allocate(1) == START
+    assert allocator.holes() == [(START + (1 << order), 1 << order) for order in range(10)]
+    assert allocator.free_bytes == 1023
+
+def test_buddy_coalesces_buddies():
+    allocator = BuddyAllocator(START, 1024)
+    blocks = [allocator.allocate(256) for _ in range(4)]
+    assert blocks == [START, START + 256, START + 512, START + 768]
+    assert allocator.allocate(1) is None
+
+    allocator.free(blocks[1], 256)
+    allocator.free(blocks[2], 256)
+    # Not buddies, so they stay apart.
+    assert allocator.holes() == [(START + 256, 256), (START + 512, 256)]
+    allocator.free(blocks[0], 256)
+    assert allocator.holes() == [(START, 512), (START + 512, 256)]
+    allocator.free(blocks[3], 256)
+    assert allocator.holes() == [(START, 1024)]
+    assert allocator.largest_hole() == 1024
+
+# A region that isn't a power of two starts out as its largest aligned blocks, and is never merged past its end.
+def test_buddy_uneven_region():
+    allocator = BuddyAllocator(START, 1000)
+    initial = [(START, 512), (START + 512, 256), (START + 768, 128), (START + 896, 64), (START + 960, 32), (START + 992, 8)]
+    assert allocator.holes() == initial
+    assert allocator.allocate(1000) is None
+    block = allocator.allocate(8)
+    assert block == START + 992
+    allocator.free(block, 8)
+    assert allocator.holes() == initial
+
+# Random allocations never overlap, are aligned to their size, and freeing everything coalesces back to the initial blocks.
+@pytest.mark.parametrize("size", [1, 64, 1000, 4096])
+def test_buddy_coalesces_back_to_initial_blocks(size):
+    rng = random.Random(size)
+    allocator = BuddyAllocator(START, size)
+    initial = allocator.holes()
+    live = []
+    for _ in range(3000):
+        if live and rng.random() < 0.45:
+            allocator.free(*live.pop(rng.randrange(len(live))))
+        else:
+            request = rng.randint(1, max(size // 8, 1))
+            block = allocator.allocate(request)
+            if block is None:
+                assert allocator.largest_hole() < request
+                continue
+            rounded = 1 << BuddyAllocator.order_of(request)
+            assert (block - START) % rounded == 0 and block - START + rounded <= size
+            assert all(block + rounded <= other or other + (1 << BuddyAllocator.order_of(other_size)) <= block for other, other_size in live)
+            live.append((block, request))
+        assert allocator.free_bytes == sum(hole_size for _, hole_size in allocator.holes())
+        assert allocator.hole_count() == len(allocator.holes())
+    rng.shuffle(live)
+    for block in live:
+        allocator.free(*block)
+    assert allocator.holes() == initial
+    assert allocator.free_bytes == size
+
+# The free list the kernel kept before the allocators: best fit over a sorted list, merging every touching hole on free.
+# Zero sized blocks are freed too, and leave empty holes that later zero sized requests are placed in.
+class FreeList:
+    def __init__(self, start: int, size: int):
+        self.holes = [(start, size)]
+
+    def allocate(self, size: int) -> int | None:
+        best = None
+        for hole in self.holes:
+            if hole[1] >= size and (best is None or hole[1] < best[1]):
+                best = hole
+        if best is None:
+            return None
+        self.holes.remove(best)
+        if best[1] > size:
+            self.holes.append((best[0] + size, best[1] - size))
+            self.holes.sort()
+        return best[0]
+
+    def free(self, freed_start: int, freed_size: int):
+        kept = []
+        for start, size in self.holes:
+            if start + size == freed_start:
+                freed_start, freed_size = start, size + freed_size
+            elif freed_start + freed_size == start:
+                freed_size += size
+            else:
+                kept.append((start, size))
+        kept.append((freed_start, freed_size))
+        kept.sort()
+        merged = [kept[0]]
+        for start, size in kept[1:]:
+            if merged[-1][0] + merged[-1][1] == start:
+                merged[-1] = (merged[-1][0], merged[-1][1] + size)
+            else:
+                merged.append((start, size))
+        self.holes = merged
+
+def test_best_fit_matches_free_list():
+    for seed in range(300):
+        rng = random.Random(seed)
+        size = rng.randint(1, 60)
+        allocator = BestFitAllocator(0, size)
+        reference = FreeList(0, size)
+        live = []
+        for _ in range(rng.randint(1, 200)):
+            if live and rng.random() < 0.45:
+                block = live.pop(rng.randrange(len(live)))
+                allocator.free(*block)
+                reference.free(*block)
+            else:
+                request = 0 if rng.random() < 0.4 else rng.randint(1, 12)
+                block = allocator.allocate(request)
+                assert block == reference.allocate(request), seed
+                if block is not None:
+                    live.append((block, request))
+            assert sorted(allocator.holes() + [(start, 0) for start in allocator.empty_holes]) == reference.holes, seed
+
+# Whatever the policy, freeing every block leaves the whole region as one hole again.
+@pytest.mark.parametrize("name", sorted(ALLOCATORS))
+def test_freeing_everything_restores_the_region(name):
+    rng = random.Random(name)
+    allocator = ALLOCATORS[name](START, 1000)
+    live = []
+    for _ in range(2000):
+        if live and rng.random() < 0.45:
+            allocator.free(*live.pop(rng.randrange(len(live))))
+        else:
+            request = rng.randint(1, 60)
+            block = allocator.allocate(request)
+            if block is not None:
+                live.append((block, request))
+    for block in live:
+        allocator.free(*block)
+    assert allocator.free_bytes == 1000
+    assert allocator.largest_hole() == (512 if name == "buddy" else 1000)
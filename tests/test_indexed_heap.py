@@ -0,0 +1,65 @@
+import random
+
+from indexed_heap import IndexedHeap
+
+def drain(heap: IndexedHeap) -> list:
+    return [heap.pop() for _ in range(len(heap))]
+
+def test_pops_in_key_order():
+    rng = random.Random(0)
+    keys = {pid: (rng.randrange(50), pid) for pid in range(200)}
+    heap = IndexedHeap(keys.__getitem__)
+    for pid in keys:
+        heap.push(pid)
+    assert heap.peek() == min(keys, key=keys.__getitem__)
+    assert drain(heap) == sorted(keys, key=keys.__getitem__)
+
+def test_remove():
+    heap = IndexedHeap(lambda pid: pid)
+    for pid in [7, 3, 9, 1, 5, 8]:
+        heap.push(pid)
+    heap.remove(1)
+    heap.remove(8)
+    assert 1 not in heap and 8 not in heap and 5 in heap
+    assert drain(heap) == [3, 5, 7, 9]
+
+def test_update_after_key_change():
+    keys = {pid: pid for pid in range(10)}
+    heap = IndexedHeap(keys.__getitem__)
+    for pid in keys:
+        heap.push(pid)
+    keys[0] = 100
+    heap.update(0)
+    keys[9] = -1
+    heap.update(9)
+    assert heap.peek() == 9
+    assert drain(heap) == [9, 1, 2, 3, 4, 5, 6, 7, 8, 0]
+
+# Random pushes, pops, removes and key changes, checked against a sorted list of what should be left.
+def test_matches_sorted_reference():
+    rng = random.Random(1)
+    keys = {}
+    heap = IndexedHeap(lambda pid: (keys[pid], pid))
+    next_pid = 0
+    for _ in range(5000):
+        action = rng.random()
+        if not keys or action < 0.35:
+            keys[next_pid] = rng.randrange(100)
+            heap.push(next_pid)
+            next_pid += 1
+        elif action < 0.55:
+            expected = min(keys, key=lambda pid: (keys[pid], pid))
+            assert heap.pop() == expected
+            del keys[expected]
+        elif action < 0.75:
+            pid = rng.choice(list(keys))
+            heap.remove(pid)
+            del keys[pid]
+        else:
+            pid = rng.choice(list(keys))
+            keys[pid] = rng.randrange(100)
+            heap.update(pid)
+        assert len(heap) == len(keys)
+        assert sorted(heap) == sorted(keys)
+        assert all(heap.positions[item] == index for index, (_, item) in enumerate(heap.heap))
+    assert drain(heap) == sorted(keys, key=lambda pid: (keys[pid], pid))
@@ -0,0 +1,56 @@
+import filecmp
+from pathlib import Path
+
+import pytest
+
+from batch import DEFAULT_EXPECTED_DIR, EXPECTED_LOG_SUFFIX, compare_logs
+from simulator import Simulator, SimulationError
+from workload_generator import WorkloadConfig, write_workload
+
+ROOT = Path(__file__).resolve().parent.parent
+DESCRIPTIONS = sorted((ROOT / "simulations").glob("*.json"))
+
+# Runs the simulation and returns the error it stopped with, if any.
+def run(description: Path, log_path: Path, tick_by_tick: bool = False, **kwargs) -> str | None:
+    simulator = Simulator(description, log_path, True, **kwargs)
+    if tick_by_tick:
+        # Jumping to the current time skips nothing, so every tick is simulated.
+        simulator.next_event_time = lambda: simulator.elapsed_time
+    try:
+        simulator.run_simulator()
+    except SimulationError as error:
+        return str(error)
+    return None
+
+# The logs in correct_output were recorded with the simulator as it was before any of the optimizations.
+@pytest.mark.parametrize("description", DESCRIPTIONS, ids=lambda path: path.stem)
+def test_golden_log(description, tmp_path):
+    log_path = tmp_path / "log.txt"
+    assert run(description, log_path) is None
+    assert compare_logs(log_path, ROOT / DEFAULT_EXPECTED_DIR / (description.stem + EXPECTED_LOG_SUFFIX)) is None
+
+def check_fast_forward(description: Path, tmp_path: Path, **kwargs):
+    fast_log = tmp_path / "fast.txt"
+    slow_log = tmp_path / "slow.txt"
+    assert run(description, fast_log, **kwargs) == run(description, slow_log, tick_by_tick=True, **kwargs)
+    assert filecmp.cmp(fast_log, slow_log, shallow=False)
+
+@pytest.mark.parametrize("description", DESCRIPTIONS, ids=lambda path: path.stem)
+def test_fast_forward_matches_tick_by_tick(description, tmp_path):
+    check_fast_forward(description, tmp_path)
+
+# Generated workloads with idle gaps, long bursts, 0 MB processes and locks, under every scheduler.
+# The last one ends in a deadlock, which has to be found at the same tick.
+WORKLOADS = [
+    WorkloadConfig(processes=40, scheduling_algorithm=algorithm, seed=seed, mean_interarrival=interarrival,
+                   cpu_distribution="bimodal", mean_cpu_time=300, priority_change_density=0.002,
+                   semaphores=2, mutexes=mutexes, lock_share=0.3, memory_size_MB=60, min_memory_MB=0, max_memory_MB=10)
+    for seed, (algorithm, interarrival, mutexes) in enumerate([("FCFS", 400, 1), ("Priority", 150, 1), ("RR", 1500, 1),
+                                                               ("Multilevel", 100, 1), ("CFS", 250, 1), ("CFS", 250, 2)])
+]
+
+@pytest.mark.parametrize("config", WORKLOADS, ids=lambda config: f"{config.scheduling_algorithm}-{config.seed}")
+def test_fast_forward_matches_tick_by_tick_on_generated_workloads(config, tmp_path):
+    description = tmp_path / "workload.json"
+    write_workload(config, description)
+    check_fast_forward(description, tmp_path, analyze_locks=True)
@@ -0,0 +1,60 @@
+import bisect
+import pickle
+import random
+
+from skip_list import SkipList
+
+# Random adds and removes, checked against a sorted list after every step.
+def test_matches_sorted_list():
+    rng = random.Random(1)
+    skip_list = SkipList()
+    reference = []
+    for _ in range(3000):
+        if reference and rng.random() < 0.4:
+            key = reference.pop(rng.randrange(len(reference)))
+            skip_list.remove(key)
+        else:
+            key = rng.randrange(10000)
+            if key in reference:
+                continue
+            skip_list.add(key)
+            bisect.insort(reference, key)
+
+        probe = rng.randrange(-10, 10010)
+        index = bisect.bisect_left(reference, probe)
+        assert skip_list.ceiling(probe) == (reference[index] if index < len(reference) else None)
+        index = bisect.bisect_right(reference, probe)
+        assert skip_list.floor(probe) == (reference[index - 1] if index > 0 else None)
+        assert list(skip_list.iter_from(probe)) == reference[bisect.bisect_left(reference, probe):]
+        assert skip_list.last() == (reference[-1] if reference else None)
+        assert len(skip_list) == len(reference)
+    assert list(skip_list) == reference
+
+def test_empty():
+    skip_list = SkipList()
+    assert list(skip_list) == []
+    assert skip_list.ceiling(0) is None
+    assert skip_list.floor(0) is None
+    assert skip_list.last() is None
+
+def test_tuple_keys():
+    skip_list = SkipList()
+    for key in [(5, 10), (3, 40), (5, 2), (3, 7)]:
+        skip_list.add(key)
+    assert list(skip_list) == [(3, 7), (3, 40), (5, 2), (5, 10)]
+    assert skip_list.ceiling((4, 0)) == (5, 2)
+    skip_list.remove((3, 40))
+    assert skip_list.floor((5, 0)) == (3, 7)
+
+# Long lists used to hit the recursion limit of pickle, and a restored list has to keep drawing the same levels.
+def test_pickle_round_trip():
+    skip_list = SkipList(seed=3)
+    for key in range(20000):
+        skip_list.add(key)
+    restored = pickle.loads(pickle.dumps(skip_list))
+    assert list(restored) == list(skip_list)
+    assert len(restored) == len(skip_list)
+    restored.add(-1)
+    restored.remove(500)
+    assert restored.ceiling(500) == 501
+    assert list(restored)[:2] == [-1, 0]
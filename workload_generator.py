@@ -0,0 +1,225 @@
+import argparse
+from dataclasses import dataclass
+import json
+from pathlib import Path
+import random
+from typing import Iterator
+
+from kernel import VIRTUAL_BASE
+from simulator import (VALID_SCHEDULING_ALGORITHMS, JSON_LINES_SUFFIX, MB_TO_BYTES, NUM_MICRO_IN_SEC, PROCESSES, ARRIVAL, TOTAL_CPU_TIME,
+                       PRIORITY, PRIORITY_CHANGES, EVENT_ARRIVAL, NEW_PRIORITY, SEMAPHORES, SEMAPHORE_ID, SEMAPHORE_INIT_VAL,
+                       PROCESS_SEMAPHORE, PROCESSES_SEMA_ID, PROCESS_SEMA_P, PROCESS_SEMA_V, MUTEXES, PROCESS_MUTEX,
+                       PROCESSES_MUTEX_ID, PROCESS_MUTEX_LOCK, PROCESS_MUTEX_UNLOCK, PROCESS_TYPE, PROCESS_MEMORY_ACCESS,
+                       PROCESS_MEMORY_NEEDED, MEMORY_SIZE)
+
+MICRO_S = int
+
+# The simulator stops if the idle process runs for a second, so no gap between two arrivals is longer than this.
+MAX_ARRIVAL_GAP: MICRO_S = NUM_MICRO_IN_SEC // 2
+
+# Settings of a synthetic workload. Times are in us, memory in MB.
+#   arrival_distribution: gaps between arrivals, see ARRIVAL_DISTRIBUTIONS
+#   cpu_distribution:     total CPU time of a process, see CPU_DISTRIBUTIONS
+#   lock_share:           share of processes with critical sections
+#   hot_lock_share:       share of critical sections on lock 0, the rest pick a lock uniformly
+#   memory_access_density, priority_change_density: events per us of CPU time
+#   fault_share:          share of memory accesses outside the memory of the process, each traps it
+@dataclass(slots=True)
+class WorkloadConfig:
+    processes: int = 1000
+    scheduling_algorithm: str = "RR"
+    memory_size_MB: int = 1000
+    seed: int = 0
+    arrival_distribution: str = "poisson"
+    mean_interarrival: float = 250
+    burst_size: int = 50
+    cpu_distribution: str = "exponential"
+    mean_cpu_time: float = 200
+    max_cpu_time: MICRO_S = 10000
+    min_priority: int = 0
+    max_priority: int = 63
+    background_share: float = 0.0
+    priority_change_density: float = 0.0
+    semaphores: int = 0
+    semaphore_capacity: int = 1
+    mutexes: int = 0
+    lock_share: float = 0.5
+    critical_sections: int = 2
+    critical_section_length: MICRO_S = 20
+    hot_lock_share: float = 0.0
+    min_memory_MB: int = 1
+    max_memory_MB: int = 10
+    memory_access_density: float = 0.01
+    fault_share: float = 0.0
+
+# Gap before the arrival of process index (counting from 0).
+#   poisson:  exponential gaps, i.e. arrivals of a Poisson process
+#   uniform:  gaps uniform in [0, 2 * mean]
+#   constant: every gap is the mean
+#   burst:    groups of burst_size processes arrive at once, with the same mean gap per process
+ARRIVAL_DISTRIBUTIONS = {
+    "poisson": lambda rng, config, index: rng.expovariate(1 / config.mean_interarrival),
+    "uniform": lambda rng, config, index: rng.uniform(0, 2 * config.mean_interarrival),
+    "constant": lambda rng, config, index: config.mean_interarrival,
+    "burst": lambda rng, config, index: config.mean_interarrival * config.burst_size if index % config.burst_size == 0 else 0,
+}
+
+# Total CPU time around the given mean.
+#   bimodal: 80% short jobs (mean / 4) and 20% long ones (4 * mean), both exponential
+CPU_DISTRIBUTIONS = {
+    "exponential": lambda rng, mean: rng.expovariate(1 / mean),
+    "uniform": lambda rng, mean: rng.uniform(1, 2 * mean),
+    "constant": lambda rng, mean: mean,
+    "bimodal": lambda rng, mean: rng.expovariate(4 / mean) if rng.random() < 0.8 else rng.expovariate(1 / (4 * mean)),
+}
+
+# Rounds x up with probability equal to its fractional part, so the expected count is x.
+def random_round(rng: random.Random, x: float) -> int:
+    count = int(x)
+    return count + 1 if rng.random() < x - count else count
+
+# Returns the critical sections of one process as (start, end, field, acquire event, release event),
+# where the events are p/v or lock/unlock entries of the semaphore or mutex field of the process.
+# A process holds at most one lock at a time and always releases it before exiting, so workloads can't deadlock:
+# the sections are placed in disjoint slices of the CPU time of the process.
+def critical_section_events(rng: random.Random, config: WorkloadConfig, total_cpu_time: MICRO_S) -> list[tuple[int, int, str, dict, dict]]:
+    locks = config.semaphores + config.mutexes
+    if locks == 0 or rng.random() >= config.lock_share:
+        return []
+
+    sections = []
+    # Event times go from 1 to total_cpu_time - 1
+    slice_length = (total_cpu_time - 1) // max(config.critical_sections, 1)
+    if slice_length < 2:
+        return []
+    for index in range(config.critical_sections):
+        slice_start = 1 + index * slice_length
+        length = min(config.critical_section_length, slice_length - 1)
+        start = slice_start + rng.randrange(slice_length - length)
+        lock = 0 if rng.random() < config.hot_lock_share else rng.randrange(locks)
+        if lock < config.semaphores:
+            sections.append((start, start + length, PROCESS_SEMAPHORE, {PROCESSES_SEMA_ID: lock, PROCESS_SEMA_P: start},
+                             {PROCESSES_SEMA_ID: lock, PROCESS_SEMA_V: start + length}))
+        else:
+            lock -= config.semaphores
+            sections.append((start, start + length, PROCESS_MUTEX, {PROCESSES_MUTEX_ID: lock, PROCESS_MUTEX_LOCK: start},
+                             {PROCESSES_MUTEX_ID: lock, PROCESS_MUTEX_UNLOCK: start + length}))
+    return sections
+
+# Builds the process description of one process. Every event of a process happens at a different CPU time, before it exits.
+def make_process(rng: random.Random, config: WorkloadConfig, arrival: MICRO_S) -> dict:
+    total_cpu_time = min(max(round(CPU_DISTRIBUTIONS[config.cpu_distribution](rng, config.mean_cpu_time)), 1), config.max_cpu_time)
+    memory_mb = rng.randint(config.min_memory_MB, config.max_memory_MB)
+    process = {
+        ARRIVAL: arrival,
+        TOTAL_CPU_TIME: total_cpu_time,
+        PRIORITY: rng.randint(config.min_priority, config.max_priority),
+        PROCESS_MEMORY_NEEDED: memory_mb,
+    }
+    if rng.random() < config.background_share:
+        process[PROCESS_TYPE] = "Background"
+
+    used_times = set()
+    sections = critical_section_events(rng, config, total_cpu_time)
+    for start, end, field, acquire, release in sections:
+        process.setdefault(field, []).extend((acquire, release))
+        used_times.update((start, end))
+
+    # The remaining events go at random free times.
+    accesses = random_round(rng, config.memory_access_density * total_cpu_time)
+    changes = random_round(rng, config.priority_change_density * total_cpu_time)
+    free_count = max(total_cpu_time - 1 - len(used_times), 0)
+    accesses = min(accesses, free_count)
+    changes = min(changes, free_count - accesses)
+    times = [time for time in rng.sample(range(1, total_cpu_time), min(accesses + changes + len(used_times), total_cpu_time - 1))
+             if time not in used_times][:accesses + changes]
+
+    if accesses > 0:
+        memory_bytes = memory_mb * MB_TO_BYTES
+        process[PROCESS_MEMORY_ACCESS] = []
+        for time in sorted(times[:accesses]):
+            # A trapped process never releases what it holds, so faults are kept out of critical sections.
+            if rng.random() < config.fault_share and not any(start < time < end for start, end, _, _, _ in sections):
+                address = VIRTUAL_BASE + memory_bytes + rng.randrange(MB_TO_BYTES)
+            else:
+                address = VIRTUAL_BASE + rng.randrange(max(memory_bytes, 1))
+            process[PROCESS_MEMORY_ACCESS].append({hex(address): time})
+    if changes > 0:
+        process[PRIORITY_CHANGES] = [{EVENT_ARRIVAL: time, NEW_PRIORITY: rng.randint(config.min_priority, config.max_priority)}
+                                     for time in sorted(times[accesses:])]
+    return process
+
+# Everything of the description except the processes.
+def make_header(config: WorkloadConfig) -> dict:
+    assert(config.scheduling_algorithm in VALID_SCHEDULING_ALGORITHMS)
+    assert(config.arrival_distribution in ARRIVAL_DISTRIBUTIONS and config.cpu_distribution in CPU_DISTRIBUTIONS)
+    assert(config.processes >= 0 and config.burst_size > 0 and config.min_memory_MB <= config.max_memory_MB)
+    # A semaphore that starts at 0 never lets a p through, since every v comes after a p of the same process.
+    assert(config.semaphore_capacity >= 1)
+    header = {"scheduling_algorithm": config.scheduling_algorithm, MEMORY_SIZE: config.memory_size_MB}
+    if config.semaphores > 0:
+        header[SEMAPHORES] = [{SEMAPHORE_ID: id, SEMAPHORE_INIT_VAL: config.semaphore_capacity} for id in range(config.semaphores)]
+    if config.mutexes > 0:
+        header[MUTEXES] = list(range(config.mutexes))
+    return header
+
+# Yields the processes in order of arrival. The same config (including the seed) always gives the same workload.
+def generate_processes(config: WorkloadConfig) -> Iterator[dict]:
+    rng = random.Random(config.seed)
+    time = 0.0
+    for index in range(config.processes):
+        time += min(ARRIVAL_DISTRIBUTIONS[config.arrival_distribution](rng, config, index), MAX_ARRIVAL_GAP)
+        yield make_process(rng, config, round(time))
+
+# Writes JSON Lines if the path ends in .jsonl, which streams the processes and works for any number of them,
+# and a regular JSON description otherwise.
+def write_workload(config: WorkloadConfig, path: Path):
+    header = make_header(config)
+    if Path(path).suffix == JSON_LINES_SUFFIX:
+        with open(path, 'w') as file:
+            file.write(json.dumps(header) + "\n")
+            for process in generate_processes(config):
+                file.write(json.dumps(process) + "\n")
+    else:
+        header[PROCESSES] = list(generate_processes(config))
+        with open(path, 'w') as file:
+            json.dump(header, file, indent=4)
+
+if __name__ == "__main__":
+    defaults = WorkloadConfig()
+    parser = argparse.ArgumentParser(description="Generates a synthetic simulation description.")
+    parser.add_argument("output", type=Path, help="description to write (.jsonl for JSON Lines, JSON otherwise)")
+    parser.add_argument("--processes", type=int, default=defaults.processes, help="number of processes")
+    parser.add_argument("--scheduling-algorithm", choices=sorted(VALID_SCHEDULING_ALGORITHMS), default=defaults.scheduling_algorithm)
+    parser.add_argument("--memory-size-mb", type=int, default=defaults.memory_size_MB)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--arrival-distribution", choices=sorted(ARRIVAL_DISTRIBUTIONS), default=defaults.arrival_distribution)
+    parser.add_argument("--mean-interarrival", type=float, default=defaults.mean_interarrival, help="mean us between two arrivals")
+    parser.add_argument("--burst-size", type=int, default=defaults.burst_size, help="processes per burst (burst arrivals)")
+    parser.add_argument("--cpu-distribution", choices=sorted(CPU_DISTRIBUTIONS), default=defaults.cpu_distribution)
+    parser.add_argument("--mean-cpu-time", type=float, default=defaults.mean_cpu_time, help="mean total CPU time in us")
+    parser.add_argument("--max-cpu-time", type=int, default=defaults.max_cpu_time, help="longest total CPU time in us")
+    parser.add_argument("--priority-range", type=int, nargs=2, default=[defaults.min_priority, defaults.max_priority], metavar=("MIN", "MAX"))
+    parser.add_argument("--background-share", type=float, default=defaults.background_share, help="share of Background processes")
+    parser.add_argument("--priority-change-density", type=float, default=defaults.priority_change_density, help="priority changes per us of CPU time")
+    parser.add_argument("--semaphores", type=int, default=defaults.semaphores, help="number of semaphores")
+    parser.add_argument("--semaphore-capacity", type=int, default=defaults.semaphore_capacity, help="initial value of every semaphore")
+    parser.add_argument("--mutexes", type=int, default=defaults.mutexes, help="number of mutexes")
+    parser.add_argument("--lock-share", type=float, default=defaults.lock_share, help="share of processes with critical sections")
+    parser.add_argument("--critical-sections", type=int, default=defaults.critical_sections, help="critical sections per locking process")
+    parser.add_argument("--critical-section-length", type=int, default=defaults.critical_section_length, help="us of CPU time a lock is held")
+    parser.add_argument("--hot-lock-share", type=float, default=defaults.hot_lock_share, help="share of critical sections on lock 0")
+    parser.add_argument("--memory-range-mb", type=int, nargs=2, default=[defaults.min_memory_MB, defaults.max_memory_MB], metavar=("MIN", "MAX"))
+    parser.add_argument("--memory-access-density", type=float, default=defaults.memory_access_density, help="memory accesses per us of CPU time")
+    parser.add_argument("--fault-share", type=float, default=defaults.fault_share, help="share of memory accesses that segfault")
+    args = parser.parse_args()
+    if args.semaphore_capacity < 1:
+        parser.error("--semaphore-capacity has to be at least 1, every p would block forever otherwise")
+
+    config = WorkloadConfig(args.processes, args.scheduling_algorithm, args.memory_size_mb, args.seed, args.arrival_distribution,
+                            args.mean_interarrival, args.burst_size, args.cpu_distribution, args.mean_cpu_time, args.max_cpu_time,
+                            args.priority_range[0], args.priority_range[1], args.background_share, args.priority_change_density,
+                            args.semaphores, args.semaphore_capacity, args.mutexes, args.lock_share, args.critical_sections,
+                            args.critical_section_length, args.hot_lock_share, args.memory_range_mb[0], args.memory_range_mb[1],
+                            args.memory_access_density, args.fault_share)
+    write_workload(config, args.output)